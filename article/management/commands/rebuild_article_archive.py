@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from article.models import ArticleArchiveCount, ArticleIndexByDatePage
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized year/month/day archive counts for ArticleIndexByDatePage instances.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'page_ids', nargs='*', type=int,
+            help='Only rebuild the given ArticleIndexByDatePage ids (default: all)',
+        )
+
+    def handle(self, *args, **options):
+        index_pages = ArticleIndexByDatePage.objects.all()
+        if options['page_ids']:
+            index_pages = index_pages.filter(pk__in=options['page_ids'])
+
+        for index_page in index_pages:
+            ArticleArchiveCount.rebuild(index_page)
+            self.stdout.write(f'Rebuilt archive counts for "{index_page.title}" ({index_page.pk})')
@@ -0,0 +1,33 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from article.models import ArticleIndexByDatePage, ArticlePage
+
+
+class Command(BaseCommand):
+    help = 'Populate the publish_date and parent_page routing fields of existing ArticlePage instances.'
+
+    def handle(self, *args, **options):
+        updated = 0
+        for article_page in ArticlePage.objects.all().iterator():
+            parent = article_page.get_parent()
+            if parent is None:
+                continue
+
+            publish_date = None
+            if isinstance(parent.specific, ArticleIndexByDatePage):
+                # take the date from the existing url_path (".../2018/01/23/my-title/") so published URLs
+                # keep resolving even where it differs from first_published_at
+                try:
+                    year, month, day = article_page.url_path.strip('/').split('/')[-4:-1]
+                    publish_date = datetime.date(int(year), int(month), int(day))
+                except ValueError:
+                    published_at = article_page.first_published_at or article_page.latest_revision_created_at
+                    publish_date = timezone.localtime(published_at).date()
+
+            ArticlePage.objects.filter(pk=article_page.pk).update(publish_date=publish_date, parent_page=parent.pk)
+            updated += 1
+
+        self.stdout.write(f'Updated routing fields for {updated} article pages')
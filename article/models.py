@@ -1,12 +1,15 @@
 from __future__ import absolute_import, unicode_literals
 
+import datetime
+
 from django.contrib.humanize.templatetags.humanize import ordinal
-from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.template.response import TemplateResponse
 from django.utils import timezone
+from django.utils.dates import MONTHS
 from django.utils.translation import gettext_lazy as _
  
 from wagtail.admin.panels import FieldPanel, FieldRowPanel, MultiFieldPanel, ObjectList, PublishingPanel, TabbedInterface, TitleFieldPanel
@@ -18,6 +21,7 @@ from wagtail.search import index
 from sitecore import blocks as sitecore_blocks
 from sitecore import constants
 from sitecore.models import SitePage
+from sitecore.pagination import IndexPaginator
 
 from article.forms import FilterForm
 
@@ -114,44 +118,25 @@ class ArticleIndexPage(RoutablePageMixin, SitePage):
         help_text=_('Specify a default image for the thumbnail in blog/card listings if the child article does not have one.'),
     )
 
+    # conditional GET validators include the newest published article (see SitePage.get_last_modified)
+    last_modified_from_children = True
+
     def get_context(self, request):
         # Update content to include only published posts; ordered by reverse-chronological
         context = super().get_context(request)
-        articles_all = self.get_children().live().order_by(self.listing_order)
-        articles_count = len(articles_all)
+        articles_all = ArticlePage.objects.child_of(self).live()
 
-        # get the paginator obj and the current page number
-        paginator = Paginator(articles_all, self.per_page)
-        page_num = request.GET.get('page')
-        page_index = int(page_num) - 1 if page_num is not None else 0
+        # get the paginator obj and the list of articles for the desired page
+        paginator = IndexPaginator(articles_all, self.per_page, ordering=self.listing_order)
+        articles_paginated = paginator.get_page(request.GET.get('page'))
+        articles_paginated.object_list = SitePage.prefetch_listing_images(articles_paginated.object_list)
 
-        # get list of articles for the desired page
-        try:
-            articles_paginated = paginator.page(page_num)
-        except PageNotAnInteger:
-            articles_paginated = paginator.page(1)
-        except EmptyPage:
-            articles_paginated = paginator.page(paginator.num_pages)
-
-        # limit page_range of the paginator (hard-coded to 3 pages both ways)
-        page_index_max = len(paginator.page_range)
-        page_index_start = max(0, page_index - 3)
-        page_index_end = min(page_index_max, page_index_start + 7)
-
-        # pass total number of pages
+        # pass total number of pages and the limited page_range of the paginator
         context['paginator_count'] = paginator.num_pages
+        context['paginator_range'] = paginator.get_page_window(articles_paginated.number)
 
-        # build new paginator ange from calculated range but also include first/last pages if not in range
-        context['paginator_range'] = []
-        if page_index_start > 0:
-            context['paginator_range'].append(1)
-        context['paginator_range'] = context['paginator_range'] + list(paginator.page_range)[page_index_start:page_index_end]
-        if page_index_end < page_index_max:
-            context['paginator_range'].append(page_index_max)
-
-        context['paginator_count'] = paginator.num_pages
         context['articles_paginated'] = articles_paginated
-        context['articles_count'] = articles_count
+        context['articles_count'] = paginator.count
 
         return context
 
@@ -211,6 +196,9 @@ class ArticleIndexPage(RoutablePageMixin, SitePage):
     def get_template(self, request, *args, **kwargs):
         return f'article/article_index_page_{self.layout_style}.html'
 
+    def get_static_export_paths(self):
+        return self.get_paginated_paths('', ArticlePage.objects.child_of(self).live().count(), self.per_page)
+
 
 class ArticleIndexByDatePage(ArticleIndexPage):
     """
@@ -233,9 +221,11 @@ class ArticleIndexByDatePage(ArticleIndexPage):
 
     def get_context(self, request, year=None, month=None, day=None):
         # Update content to include only published posts; ordered by reverse-chronological
+        # Skip ArticleIndexPage.get_context as the unfiltered listing is replaced below
 
-        context = super().get_context(request)
-        articles_all = self.get_children().live().order_by(self.listing_order)
+        context = super(ArticleIndexPage, self).get_context(request)
+        articles_all = ArticlePage.objects.child_of(self).live()
+        url_params = ''
 
         if request.method == 'GET':
             query_dict = request.GET.copy()
@@ -254,54 +244,23 @@ class ArticleIndexByDatePage(ArticleIndexPage):
         if day:
             articles_all = articles_all.filter(first_published_at__day=day)
 
-        articles_count = len(articles_all)
+        # get the paginator obj and the list of articles for the desired page
+        paginator = IndexPaginator(articles_all, self.per_page, ordering=self.listing_order)
+        articles_paginated = paginator.get_page(request.GET.get('page'))
+        articles_paginated.object_list = SitePage.prefetch_listing_images(articles_paginated.object_list)
 
-        # LML: future upgrade
-        # get count per year
-        # follow that with count per month if year filter given
-        # follow that with count per day if both year and month filter given
-
-        # will require:
-        # from django.db.models import Count
-        # from django.db.models.functions import ExtractYear
-
-        # get counts:
-        # yearly_count = all_articles.annotate(year=ExtractYear('first_published_at')).values('year').annotate(count=Count('id')).order_by('year')
-
-        # get the paginator obj and the current page number
-        paginator = Paginator(articles_all, self.per_page)
-        page_num = request.GET.get('page')
-        page_index = int(page_num) - 1 if page_num is not None else 0
-
-        # get list of articles for the desired page
-        try:
-            articles_paginated = paginator.page(page_num)
-        except PageNotAnInteger:
-            articles_paginated = paginator.page(1)
-        except EmptyPage:
-            articles_paginated = paginator.page(paginator.num_pages)
-
-        # limit page_range of the paginator (hard-coded to 3 pages both ways)
-        page_index_max = len(paginator.page_range)
-        page_index_start = max(0, page_index - 3)
-        page_index_end = min(page_index_max, page_index_start + 7)
-
-        # pass total number of pages
+        # pass total number of pages and the limited page_range of the paginator
         context['paginator_count'] = paginator.num_pages
+        context['paginator_range'] = paginator.get_page_window(articles_paginated.number)
 
-        # build new paginator ange from calculated range but also include first/last pages if not in range
-        context['paginator_range'] = []
-        if page_index_start > 0:
-            context['paginator_range'].append(1)
-        context['paginator_range'] = context['paginator_range'] + list(paginator.page_range)[page_index_start:page_index_end]
-        if page_index_end < page_index_max:
-            context['paginator_range'].append(page_index_max)
+        # per-year/month/day counts come from the materialized ArticleArchiveCount rows, not the child pages
+        archive_counts = self.get_archive_counts(year=year, month=month)
 
         form = FilterForm()
-        year_choices = list(self.get_children().live().order_by('-first_published_at__year').values_list('first_published_at__year', flat=True).distinct('first_published_at__year'))
-        form.fields['selected_date'].widget.years = year_choices
+        form.fields['selected_date'].widget.years = [entry['year'] for entry in archive_counts['years']]
 
         context['form'] = form
+        context['archive_counts'] = archive_counts
         context['url_params'] = url_params
 
         context['year'] = year
@@ -309,17 +268,50 @@ class ArticleIndexByDatePage(ArticleIndexPage):
         context['day'] = ordinal(day) if day else day
 
         context['articles_paginated'] = articles_paginated
-        context['articles_count'] = articles_count
+        context['articles_count'] = paginator.count
 
         return context
 
+    def get_archive_counts(self, year=None, month=None):
+        """
+        Return the archive counts for the sidebar from a single read of the ArticleArchiveCount table:
+        - 'years' the count per year (always)
+        - 'months' the count per month of the selected year (if year given)
+        - 'days' the count per day of the selected month (if year and month given and filter_by_day enabled)
+        """
+        year = int(year) if year and str(year).isdigit() else None
+        month = int(month) if month and str(month).isdigit() else None
+
+        selection = models.Q(month=0)
+        if year:
+            selection |= models.Q(year=year, day=0)
+            if month and self.filter_by_day:
+                selection |= models.Q(year=year, month=month)
+
+        archive_counts = {'years': [], 'months': [], 'days': []}
+        for entry in self.archive_counts.filter(selection).order_by('-year', 'month', 'day'):
+            if entry.month == 0:
+                archive_counts['years'].append({'year': entry.year, 'count': entry.count})
+            elif entry.day == 0:
+                archive_counts['months'].append({'year': entry.year, 'month': entry.month, 'label': MONTHS[entry.month], 'count': entry.count})
+            else:
+                archive_counts['days'].append({'year': entry.year, 'month': entry.month, 'day': entry.day, 'count': entry.count})
+        return archive_counts
+
     # route for sub-pages with a date specific URL for posts
     # this will NOT make a list of pages at blog/2018 just specific blogs only
 
+    route_checks = {
+        'article_index_by_date': 'get_listing_route_date',
+        'article_page_by_date': 'get_dated_article',
+        'sub_article_page_by_date': 'get_dated_sub_article',
+    }
+
     @route(r'^(?P<year>[0-9]{4})/?$')
     @route(r'^(?P<year>[0-9]{4})/(?P<month>[0-9]{2})/?$')
     @route(r'^(?P<year>[0-9]{4})/(?P<month>[0-9]{2})/(?P<day>[0-9]{2})/?$')
     def article_index_by_date(self, request, year, month=None, day=None, name='article-index-by-date'):
+        self.get_listing_route_date(year, month, day)
         return TemplateResponse(
             request,
             self.get_template(request),
@@ -329,35 +321,65 @@ class ArticleIndexByDatePage(ArticleIndexPage):
     @route(r'^(?P<year>[0-9]{4})/(?P<month>[0-9]{2})/(?P<day>[0-9]{2})/(?P<slug>[\w-]+)/?$')
     def article_page_by_date(self, request, year, month, day, slug, name='article-by-date'):
         """Serve a single article page at URL (eg. .../2018/01/23/my-title/)"""
-
-        article_page = get_object_or_404(
-            self.get_children().live().specific(),
-            first_published_at__year=year,
-            first_published_at__month=month,
-            first_published_at__day=day,
-            slug=slug
-        )
-
-        return article_page.serve(request)
+        return self.get_dated_article(year, month, day, slug).serve(request)
 
     @route(r'^(?P<year>[0-9]{4})/(?P<month>[0-9]{2})/(?P<day>[0-9]{2})/(?P<slug>[\w-]+)/(?P<sub>[/\w-]+)/?$')
     def sub_article_page_by_date(self, request, year, month, day, slug, sub, name='sub-article-by-date'):
         """Serve a single sub article page at URL (eg. .../2018/01/23/my-title/sub-article)"""
-        article_page = get_object_or_404(
-            ArticlePage,
-            first_published_at__year=year,
-            first_published_at__month=month,
-            first_published_at__day=day,
+        return self.get_dated_sub_article(year, month, day, slug, sub).serve(request)
+
+    def get_dated_article(self, year, month, day, slug, live=True):
+        """Return the article at a dated URL, raising a 404 for impossible dates or no such article"""
+        articles = ArticlePage.objects.live() if live else ArticlePage.objects.all()
+        return get_object_or_404(
+            articles,
+            parent_page=self,
+            publish_date=self.get_route_date(year, month, day),
             slug=slug
         )
+
+    def get_dated_sub_article(self, year, month, day, slug, sub):
+        article_page = self.get_dated_article(year, month, day, slug, live=False)
         # sub is now of form "one/" or "one/two/" etc
-        # TODO: improve for multiple children and consider query set first accessor?
-        sub_article_page = article_page.get_children().live().specific().filter(slug=sub.strip("/"))
-        return sub_article_page[0].serve(request)
+        # TODO: improve for multiple children
+        sub_article_page = article_page.get_children().live().specific().filter(slug=sub.strip("/")).first()
+        if sub_article_page is None:
+            raise Http404
+        return sub_article_page
+
+
+    @staticmethod
+    def get_route_date(year, month, day):
+        """Convert the year/month/day URL parts to a date, raising a 404 for impossible dates (eg. 2018/02/31)"""
+        try:
+            return datetime.date(int(year), int(month), int(day))
+        except ValueError:
+            raise Http404
+
+    @classmethod
+    def get_listing_route_date(cls, year, month=None, day=None):
+        """As get_route_date, for the year, month and day listing routes (eg. 2018/13/ is a 404)"""
+        return cls.get_route_date(year, month or 1, day or 1)
 
     def get_template(self, request, *args, **kwargs):
         return f'article/article_index_by_date_page_{self.sidebar_placement}.html'
 
+    def get_static_export_paths(self):
+        """
+        Add the year and month (and day, if filter_by_day) listing routes, paginated from the counts in the
+        ArticleArchiveCount table.
+        """
+        paths = super().get_static_export_paths()
+        archive_counts = self.archive_counts.all() if self.filter_by_day else self.archive_counts.filter(day=0)
+        for entry in archive_counts.order_by('year', 'month', 'day'):
+            path = f'{entry.year}/'
+            if entry.month:
+                path += f'{entry.month:02d}/'
+            if entry.day:
+                path += f'{entry.day:02d}/'
+            paths += self.get_paginated_paths(path, entry.count, self.per_page)
+        return paths
+
     # Rebuild settings tab panel
 
     settings_tab_panel = ArticleIndexPage.settings_tab_panel + [
@@ -588,6 +610,29 @@ class ArticlePage(SitePage):
         choices=SIDEBAR_PLACEMENT_CHOICES,
     )
 
+    # routing fields (maintained by set_url_path, not editable)
+
+    publish_date = models.DateField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text=_('The date used in the URL of an article beneath an ArticleIndexByDatePage.'),
+    )
+
+    parent_page = models.ForeignKey(
+        'wagtailcore.Page',
+        null=True,
+        blank=True,
+        editable=False,
+        on_delete=models.SET_NULL,
+        related_name='+',
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['parent_page', 'publish_date'], name='article_parent_publish_idx'),
+        ]
+
     # Append which fields are to be searchable
 
     search_fields = SitePage.search_fields + [
@@ -721,6 +766,10 @@ class ArticlePage(SitePage):
         ObjectList(publish_tab_panel, heading='Publish'),
     ])
 
+    # images (and their renditions) batch loaded for the index listing templates, see SitePage.prefetch_listing_images
+    listing_image_fields = ('thumbnail_image', 'article_image')
+    listing_filterspecs = ('fill-300x300', 'fill-600x150', 'fill-600x300')
+
     # override inherited methods
 
     def get_template(self, request, *args, **kwargs):
@@ -730,14 +779,92 @@ class ArticlePage(SitePage):
         # initially set the attribute self.url_path using the normal operation
         super().set_url_path(parent=parent)
 
-        # only modify url if page is a child of an ArticleIndexByDatePage
+        # record the parent and URL date so ArticleIndexByDatePage routes can use an indexed lookup
+        self.parent_page_id = parent.pk
+        self.publish_date = None
+
+        # only modify url if page is a child of an ArticleIndexByDatePage; dated by local time, as are the
+        # year/month/day listings and archive counts
         if isinstance(parent.specific, ArticleIndexByDatePage):
-            if self.first_published_at:
-                self.url_path = self.url_path.replace(
-                    self.slug, '{:%Y/%m/%d/}'.format(self.first_published_at) + self.slug
-                )
-            else:
-                self.url_path = self.url_path.replace(
-                    self.slug, '{:%Y/%m/%d/}'.format(timezone.now()) + self.slug
-                )
+            published_at = timezone.localtime(self.first_published_at or timezone.now())
+            self.publish_date = published_at.date()
+            self.url_path = self.url_path.replace(
+                self.slug, '{:%Y/%m/%d/}'.format(published_at) + self.slug
+            )
+        return self.url_path
+
+
+class ArticleArchiveCount(models.Model):
+    """
+    Materialized per-year, per-month and per-day counts of the live ArticlePage children of an
+    ArticleIndexByDatePage, used for the FilterForm year widget and the archive sidebar so that archive
+    navigation never scans the child pages at request time.
+
+    Rows with month=0 hold the year total; rows with day=0 hold the month total.
+
+    Counts are maintained by the publish/unpublish/move/delete receivers in article/receivers.py, which
+    call refresh() for the affected (index page, date) only. rebuild() recalculates an entire index page
+    (see the rebuild_article_archive management command).
+    """
 
+    index_page = models.ForeignKey(
+        ArticleIndexByDatePage,
+        on_delete=models.CASCADE,
+        related_name='archive_counts',
+    )
+
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField(default=0)
+    day = models.PositiveSmallIntegerField(default=0)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = (
+            ('index_page', 'year', 'month', 'day'),
+        )
+
+    def __str__(self):
+        return f'{self.index_page_id}: {self.year}/{self.month}/{self.day} ({self.count})'
+
+    @classmethod
+    def refresh(cls, index_page, date):
+        """
+        Recalculate the year, month and day rows covering the given date for one index page.
+        """
+        articles = ArticlePage.objects.live().child_of(index_page)
+        buckets = (
+            ((date.year, 0, 0), {'first_published_at__year': date.year}),
+            ((date.year, date.month, 0), {'first_published_at__year': date.year, 'first_published_at__month': date.month}),
+            ((date.year, date.month, date.day), {'first_published_at__date': date}),
+        )
+        with transaction.atomic():
+            for (year, month, day), lookup in buckets:
+                count = articles.filter(**lookup).count()
+                if count:
+                    cls.objects.update_or_create(
+                        index_page=index_page, year=year, month=month, day=day,
+                        defaults={'count': count},
+                    )
+                else:
+                    cls.objects.filter(index_page=index_page, year=year, month=month, day=day).delete()
+
+    @classmethod
+    def rebuild(cls, index_page):
+        """
+        Recalculate all rows for one index page from its live children.
+        """
+        counts = {}
+        dates = ArticlePage.objects.live().child_of(index_page).values_list('first_published_at', flat=True)
+        for published_at in dates.iterator():
+            if published_at is None:
+                continue
+            date = timezone.localtime(published_at).date()
+            for key in ((date.year, 0, 0), (date.year, date.month, 0), (date.year, date.month, date.day)):
+                counts[key] = counts.get(key, 0) + 1
+
+        with transaction.atomic():
+            cls.objects.filter(index_page=index_page).delete()
+            cls.objects.bulk_create([
+                cls(index_page=index_page, year=year, month=month, day=day, count=count)
+                for (year, month, day), count in counts.items()
+            ])
@@ -0,0 +1,68 @@
+"""
+Article receivers module for keeping the materialized ArticleArchiveCount rows and the ArticlePage
+routing fields in step with the publish, unpublish, move and delete events of ArticlePage instances.
+:Copyright: Research IT, IT Services, The University of Manchester
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from wagtail.models import Page
+from wagtail.signals import page_published, page_unpublished, post_page_move
+
+from article.models import ArticleArchiveCount, ArticleIndexByDatePage, ArticlePage
+
+
+def refresh_archive_counts(parent_path, published_at):
+    """
+    Refresh the archive counts for the date of an article under the index page at parent_path (if that
+    parent is an ArticleIndexByDatePage). Deferred until commit so the counts see the final page state.
+    """
+    if published_at is None:
+        return
+
+    date = timezone.localtime(published_at).date()
+
+    def refresh():
+        index_page = ArticleIndexByDatePage.objects.filter(path=parent_path).first()
+        if index_page:
+            ArticleArchiveCount.refresh(index_page, date)
+
+    transaction.on_commit(refresh)
+
+
+def get_parent_path(page):
+    return page.path[:-Page.steplen]
+
+
+@receiver(page_published, sender=ArticlePage)
+@receiver(page_unpublished, sender=ArticlePage)
+@receiver(post_delete, sender=ArticlePage)
+def update_archive_counts(sender, instance, **kwargs):
+    refresh_archive_counts(get_parent_path(instance), instance.first_published_at)
+
+
+@receiver(post_page_move, sender=ArticlePage)
+def update_archive_counts_on_move(sender, instance, parent_page_before, parent_page_after, **kwargs):
+    if parent_page_before.pk == parent_page_after.pk:
+        return
+    refresh_archive_counts(parent_page_before.path, instance.first_published_at)
+    refresh_archive_counts(parent_page_after.path, instance.first_published_at)
+
+
+@receiver(post_page_move, sender=ArticlePage)
+def update_routing_fields_on_move(sender, instance, parent_page_after, url_path_after, **kwargs):
+    """
+    Wagtail moves pages as plain Page instances, so ArticlePage.set_url_path is not called; re-run it so the
+    parent_page/publish_date routing fields (and the dated URL under an ArticleIndexByDatePage) follow the move.
+    """
+    article_page = ArticlePage.objects.get(pk=instance.pk)
+    article_page.set_url_path(parent_page_after)
+    ArticlePage.objects.filter(pk=article_page.pk).update(
+        url_path=article_page.url_path,
+        publish_date=article_page.publish_date,
+        parent_page=article_page.parent_page_id,
+    )
+    if article_page.url_path != url_path_after:
+        article_page._update_descendant_url_paths(url_path_after, article_page.url_path)
@@ -19,4 +19,5 @@ def article_blog_summary(context, post, show_taggit=False, taggit_slug='', displ
       'show_taggit': show_taggit,
       'taggit_slug': taggit_slug,
       'display_meta': display_meta,
+      'request': context.get('request'),
    }
@@ -1,3 +1,135 @@
-from django.test import TestCase
+import datetime
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.utils.http import http_date
+
+from wagtail.models import Page
+
+from article.models import ArticleArchiveCount, ArticleIndexByDatePage, ArticlePage
+from home.models import HomePage
+from sitecore.tests import SiteTestCase, TemporaryMediaMixin
+
+
+class ArticleArchiveCountTest(TemporaryMediaMixin, TestCase):
+
+    def setUp(self):
+        home = Page.get_first_root_node().add_child(instance=HomePage(title='Home', slug='test-home'))
+        self.blog = home.add_child(instance=ArticleIndexByDatePage(title='Blog', slug='blog', filter_by_day=True))
+        self.news = home.add_child(instance=ArticleIndexByDatePage(title='News', slug='news', filter_by_day=True))
+
+    def add_article(self, parent, slug, year, month, day):
+        article = parent.add_child(instance=ArticlePage(
+            title=slug,
+            slug=slug,
+            first_published_at=timezone.make_aware(datetime.datetime(year, month, day, 12)),
+        ))
+        with self.captureOnCommitCallbacks(execute=True):
+            article.save_revision().publish()
+        return ArticlePage.objects.get(pk=article.pk)
+
+    def get_counts(self, index_page):
+        return sorted(
+            ArticleArchiveCount.objects.filter(index_page=index_page).values_list('year', 'month', 'day', 'count')
+        )
+
+    def assertCountsMatchRebuild(self, index_page, expected):
+        self.assertEqual(self.get_counts(index_page), sorted(expected))
+        ArticleArchiveCount.rebuild(index_page)
+        self.assertEqual(self.get_counts(index_page), sorted(expected))
+
+    def test_publish_counts_year_month_and_day(self):
+        self.add_article(self.blog, 'one', 2022, 12, 31)
+        self.add_article(self.blog, 'two', 2023, 1, 15)
+        self.add_article(self.blog, 'three', 2023, 1, 15)
+        self.add_article(self.blog, 'four', 2023, 3, 1)
+        self.assertCountsMatchRebuild(self.blog, [
+            (2022, 0, 0, 1), (2022, 12, 0, 1), (2022, 12, 31, 1),
+            (2023, 0, 0, 3), (2023, 1, 0, 2), (2023, 1, 15, 2), (2023, 3, 0, 1), (2023, 3, 1, 1),
+        ])
+        self.assertEqual(self.get_counts(self.news), [])
+
+        archive_counts = self.blog.get_archive_counts(year='2023', month='01')
+        self.assertEqual([(entry['year'], entry['count']) for entry in archive_counts['years']], [(2023, 3), (2022, 1)])
+        self.assertEqual([(entry['month'], entry['count']) for entry in archive_counts['months']], [(1, 2), (3, 1)])
+        self.assertEqual([(entry['day'], entry['count']) for entry in archive_counts['days']], [(15, 2)])
+
+    def test_unpublish_removes_counts(self):
+        article = self.add_article(self.blog, 'one', 2023, 1, 15)
+        self.add_article(self.blog, 'two', 2023, 1, 15)
+        self.add_article(self.blog, 'three', 2023, 2, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            article.unpublish()
+        self.assertCountsMatchRebuild(self.blog, [
+            (2023, 0, 0, 2), (2023, 1, 0, 1), (2023, 1, 15, 1), (2023, 2, 0, 1), (2023, 2, 1, 1),
+        ])
+
+        article = ArticlePage.objects.get(slug='three')
+        with self.captureOnCommitCallbacks(execute=True):
+            article.unpublish()
+        self.assertCountsMatchRebuild(self.blog, [(2023, 0, 0, 1), (2023, 1, 0, 1), (2023, 1, 15, 1)])
+
+    def test_move_updates_both_index_pages(self):
+        article = self.add_article(self.blog, 'one', 2023, 1, 15)
+        self.add_article(self.blog, 'two', 2023, 2, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            article.move(self.news, pos='last-child')
+        self.assertCountsMatchRebuild(self.blog, [(2023, 0, 0, 1), (2023, 2, 0, 1), (2023, 2, 1, 1)])
+        self.assertCountsMatchRebuild(self.news, [(2023, 0, 0, 1), (2023, 1, 0, 1), (2023, 1, 15, 1)])
+
+        # the dated routing fields follow the move
+        article = ArticlePage.objects.get(pk=article.pk)
+        self.assertEqual(article.parent_page_id, self.news.pk)
+        self.assertEqual(article.url_path, f'{self.news.url_path}2023/01/15/one/')
+
+    def test_delete_removes_counts(self):
+        article = self.add_article(self.blog, 'one', 2023, 1, 15)
+        with self.captureOnCommitCallbacks(execute=True):
+            article.delete()
+        self.assertCountsMatchRebuild(self.blog, [])
+
+
+@mock.patch('sitecore.wagtail_hooks.CONDITIONAL_GET_ENABLED', True)
+class ArticleRouteConditionalGetTest(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.blog = self.site.root_page.add_child(instance=ArticleIndexByDatePage(title='Blog', slug='blog'))
+        self.blog.save_revision().publish()
+        self.add_article(self.blog, title='One', published_at=timezone.make_aware(datetime.datetime(2023, 1, 15, 12)))
+        self.if_modified_since = http_date(time.time() + 60)
+
+    def test_valid_routes_are_not_modified(self):
+        for path in ('/blog/2023/', '/blog/2023/01/', '/blog/2023/01/15/', '/blog/2023/01/15/one/'):
+            self.assertEqual(self.client.get(path, HTTP_IF_MODIFIED_SINCE=self.if_modified_since).status_code, 304, path)
+
+    def test_rejected_routes_are_not_answered_with_304(self):
+        for path in ('/blog/2023/13/', '/blog/2023/02/31/', '/blog/2023/02/31/one/', '/blog/2023/01/16/one/', '/blog/2023/01/15/two/', '/blog/2023/01/15/one/sub/'):
+            self.assertEqual(self.client.get(path, HTTP_IF_MODIFIED_SINCE=self.if_modified_since).status_code, 404, path)
+
+
+@override_settings(TIME_ZONE='Europe/Paris')
+class ArticleRouteDateTest(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.blog = self.site.root_page.add_child(instance=ArticleIndexByDatePage(title='Blog', slug='blog', filter_by_day=True))
+        self.blog.save_revision().publish()
+        # 15 January local time, but still 14 January in UTC
+        self.article = self.add_article(
+            self.blog, title='Late', published_at=datetime.datetime(2023, 1, 14, 23, 30, tzinfo=datetime.timezone.utc)
+        )
+
+    def test_url_and_archive_counts_use_the_local_date(self):
+        self.assertEqual(self.article.publish_date, datetime.date(2023, 1, 15))
+        self.assertEqual(self.article.url_path, f'{self.blog.url_path}2023/01/15/late/')
+        self.assertEqual(
+            list(self.blog.archive_counts.filter(day__gt=0).values_list('year', 'month', 'day', 'count')),
+            [(2023, 1, 15, 1)],
+        )
+        self.assertContains(self.client.get('/blog/2023/01/15/'), 'href="/blog/2023/01/15/late/"')
+        self.assertEqual(self.client.get('/blog/2023/01/15/late/').status_code, 200)
@@ -0,0 +1,20 @@
+"""
+Article Wagtail hooks to append/modify default behaviour of the Wagtail system.
+:Copyright: Research IT, IT Services, The University of Manchester
+"""
+from wagtail import hooks
+
+from sitecore.renditions import get_responsive_rendition_filter_specs
+
+from .models import ArticlePage
+
+
+@hooks.register('register_rendition_filter_specs')
+def article_rendition_filter_specs():
+    """
+    This hook adds the responsive renditions of the article banner image styles and the splash image to the
+    renditions generated on image upload.
+    """
+    return get_responsive_rendition_filter_specs(
+        [spec for spec, label in ArticlePage.ARTICLE_IMAGE_FILTERSPEC_CHOICES]
+    ) + get_responsive_rendition_filter_specs(['width-3840'], widths=(960, 1920))
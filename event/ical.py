@@ -0,0 +1,77 @@
+"""
+Event ical module for streaming EventOccurrence rows as an iCalendar (RFC 5545) feed.
+:Copyright: Research IT, IT Services, The University of Manchester
+"""
+import datetime
+import html
+import zoneinfo
+
+from django.conf import settings
+from django.utils.html import strip_tags
+
+
+ICAL_PRODID = '-//Research IT - The University of Manchester//Wagtail Events//EN'
+
+
+def escape_text(value):
+    """Escape a TEXT property value (RFC 5545 3.3.11)"""
+    return (
+        str(value).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def fold_line(line):
+    """Fold a content line to 75 octets, continuing lines with a leading space (RFC 5545 3.1)"""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+
+    parts = []
+    limit = 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        # don't split a multi-byte character
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+        limit = 74
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def format_datetime(date, time):
+    """Format a (site time zone) date and time as a UTC DATE-TIME value"""
+    local = datetime.datetime.combine(date, time, tzinfo=zoneinfo.ZoneInfo(settings.TIME_ZONE))
+    return local.astimezone(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def iter_calendar(occurrences, request, calendar_name):
+    """
+    Yield the lines of a VCALENDAR with one VEVENT per occurrence. occurrences should be an iterator
+    (with event_page selected) so the feed is never built in memory.
+    """
+    yield fold_line('BEGIN:VCALENDAR')
+    yield fold_line('VERSION:2.0')
+    yield fold_line(f'PRODID:{ICAL_PRODID}')
+    yield fold_line('CALSCALE:GREGORIAN')
+    yield fold_line(f'X-WR-CALNAME:{escape_text(calendar_name)}')
+
+    host = request.get_host().split(':')[0]
+    for occurrence in occurrences:
+        event_page = occurrence.event_page
+        description = event_page.search_description or html.unescape(strip_tags(event_page.intro))
+
+        yield fold_line('BEGIN:VEVENT')
+        yield fold_line(f'UID:event-{event_page.pk}-{occurrence.date:%Y%m%d}-{occurrence.start_time:%H%M}@{host}')
+        yield fold_line(f'DTSTAMP:{event_page.last_published_at.astimezone(datetime.timezone.utc):%Y%m%dT%H%M%SZ}')
+        yield fold_line(f'DTSTART:{format_datetime(occurrence.date, occurrence.start_time)}')
+        yield fold_line(f'DTEND:{format_datetime(occurrence.date, occurrence.end_time)}')
+        yield fold_line(f'SUMMARY:{escape_text(event_page.title)}')
+        if description:
+            yield fold_line(f'DESCRIPTION:{escape_text(description.strip())}')
+        yield fold_line(f'LOCATION:{escape_text(event_page.location)}')
+        yield fold_line(f'URL:{event_page.get_full_url(request)}')
+        yield fold_line('END:VEVENT')
+
+    yield fold_line('END:VCALENDAR')
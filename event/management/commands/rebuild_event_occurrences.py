@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from event.models import EventOccurrence, EventPage
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the EventOccurrence rows from the dates StreamField of every EventPage.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'page_ids', nargs='*', type=int,
+            help='Only rebuild the given EventPage ids (default: all)',
+        )
+
+    def handle(self, *args, **options):
+        event_pages = EventPage.objects.all()
+        if options['page_ids']:
+            event_pages = event_pages.filter(pk__in=options['page_ids'])
+
+        count = 0
+        for event_page in event_pages.iterator():
+            EventOccurrence.update_for_page(event_page)
+            count += 1
+
+        self.stdout.write(f'Rebuilt occurrences for {count} event pages')
@@ -1,26 +1,39 @@
 from __future__ import absolute_import, unicode_literals
 
+import calendar
 import datetime
+import hashlib
+from collections import defaultdict
 
-from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.core.cache import cache
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
 from django.forms import ValidationError
 from django.forms.utils import ErrorList
+from django.http import Http404, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.template.response import TemplateResponse
+from django.utils.cache import get_conditional_response
+from django.utils import timezone
+from django.utils.http import http_date, quote_etag
+from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy as _
  
 from wagtail.fields import RichTextField, StreamField
 from wagtail import blocks
 from wagtail.admin.panels import FieldPanel, MultiFieldPanel, PageChooserPanel, ObjectList, PublishingPanel,  TabbedInterface, TitleFieldPanel
 from wagtail.admin.widgets.slug import SlugInput
-from wagtail.admin.forms import WagtailAdminPageForm
+from wagtail.contrib.routable_page.models import route, RoutablePageMixin
 from wagtail.search import index
 
 from sitecore import blocks as sitecore_blocks
-from sitecore.models import SitePage
+from sitecore.models import SitePage, SitePageForm
+from sitecore.pagination import IndexPaginator, LISTING_CACHE_TIMEOUT, get_listing_generation
 
+from event.ical import iter_calendar
 
-class EventIndexPage(SitePage):
+
+class EventIndexPage(RoutablePageMixin, SitePage):
 
     intro = StreamField(
         sitecore_blocks.CoreBlock,
@@ -120,57 +133,200 @@ class EventIndexPage(SitePage):
         context = super().get_context(request)
 
         event_order = self.events_date_order
+        events_all = self.get_events()
+
+        # get the paginator obj and the list of events for the desired page
+        paginator = IndexPaginator(events_all, self.per_page, ordering=event_order)
+        events_paginated = paginator.get_page(request.GET.get('page'))
+        events_paginated.object_list = SitePage.prefetch_listing_images(events_paginated.object_list)
+
+        # pass total number of pages and the limited page_range of the paginator
+        context['paginator_count'] = paginator.num_pages
+        context['paginator_range'] = paginator.get_page_window(events_paginated.number)
+
+        context['events_count'] = paginator.count
+        context['events_paginated'] = events_paginated
+
+        return context
+
+    def get_index_root(self):
+        return self.index_root_page or self
+
+    route_checks = {
+        'event_calendar_month': 'get_calendar_month',
+        'event_calendar_week': 'get_calendar_week',
+    }
+
+    # a child page with one of these slugs would be shadowed by the iCalendar and calendar routes
+    reserved_child_slugs = ('ical', 'calendar')
+
+    def get_static_export_paths(self):
+        # the calendar and iCalendar routes depend on the current date/week so are always served dynamically
+        return self.get_paginated_paths('', self.get_events().count(), self.per_page)
+
+    def get_last_modified(self, request, *args, **kwargs):
+        """
+        The listing and calendars show the events under the index root, selected relative to today, so
+        Last-Modified is the newest of the index page, those events and the start of today.
+        """
+        if not self.is_valid_route(*args):
+            return None
+        latest = EventPage.objects.live().child_of(self.get_index_root()).aggregate(
+            latest=models.Max('last_published_at'))['latest']
+        today = timezone.make_aware(datetime.datetime.combine(datetime.date.today(), datetime.time.min))
+        return max(filter(None, (self.last_published_at, latest, today)))
+
+    def get_events(self):
+        """Return the live events under the index root page, filtered by events_date_filter (unordered)"""
         today = datetime.date.today()
-        if self.index_root_page:
-            index_root = self.index_root_page
-        else:
-            index_root = self
+        events_all = EventPage.objects.live().child_of(self.get_index_root())
 
         if self.events_date_filter == self.EVENTS_FILTER_CURRENT_AND_FUTURE:
-            events_all = EventPage.objects.live().child_of(index_root).filter(end_date__gte=today).order_by(event_order)
+            return events_all.filter(end_date__gte=today)
 
         elif self.events_date_filter == self.EVENTS_FILTER_FUTURE:
-            events_all = EventPage.objects.live().child_of(index_root).filter(start_date__gt=today).order_by(event_order)
+            return events_all.filter(start_date__gt=today)
 
         elif self.events_date_filter == self.EVENTS_FILTER_PAST_AND_CURRENT:
-            events_all = EventPage.objects.live().child_of(index_root).filter(start_date__lte=today).order_by(event_order)
+            return events_all.filter(start_date__lte=today)
 
         else:  # self.EVENTS_FILTER_PAST
-            events_all = EventPage.objects.live().child_of(index_root).filter(end_date__lt=today).order_by(event_order)
-
-        events_count = len(events_all)
-
-        # get the paginator obj and the current page number
-        paginator = Paginator(events_all, self.per_page)
-        page_num = request.GET.get('page')
-        page_index = int(page_num) - 1 if page_num is not None else 0
-
-        # get list of events for the desired page
+            return events_all.filter(end_date__lt=today)
+
+    # iCalendar feed of the (filtered) events
+
+    @route(r'^ical/$')
+    def event_ical_feed(self, request, name='event-ical-feed'):
+        """
+        Stream the events selected by events_date_filter as an iCalendar feed at URL (eg. .../ical/).
+        The ETag/Last-Modified validators come from the newest last_published_at, so polling calendar
+        clients get a 304 until an event is published, unpublished or the date filter moves on a day.
+        """
+        events = self.get_events()
+        fingerprint = events.aggregate(count=models.Count('pk'), latest=models.Max('last_published_at'))
+        etag = hashlib.md5(
+            f'{self.pk}|{self.events_date_filter}|{datetime.date.today()}|{fingerprint}'.encode('utf-8')
+        ).hexdigest()
+        last_modified = fingerprint['latest'] and int(fingerprint['latest'].timestamp())
+
+        response = get_conditional_response(request, etag=quote_etag(etag), last_modified=last_modified)
+        if response is None:
+            occurrences = (
+                EventOccurrence.objects.filter(event_page__in=events)
+                .select_related('event_page').order_by('date', 'start_time').iterator()
+            )
+            response = StreamingHttpResponse(
+                iter_calendar(occurrences, request, self.title), content_type='text/calendar; charset=utf-8'
+            )
+            response['Content-Disposition'] = f'inline; filename="{self.slug}.ics"'
+
+        response['ETag'] = quote_etag(etag)
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    # calendar routes (month grid and week agenda) built from the EventOccurrence table
+
+    @route(r'^calendar/$')
+    @route(r'^calendar/(?P<year>[0-9]{4})/(?P<month>[0-9]{2})/$')
+    def event_calendar_month(self, request, year=None, month=None, name='event-calendar-month'):
+        """Serve the month grid calendar at URL (eg. .../calendar/2024/01/); defaults to the current month"""
+        first_day = self.get_calendar_month(year, month)
+
+        previous_month = first_day - datetime.timedelta(days=1)
+        next_month = (first_day + datetime.timedelta(days=32)).replace(day=1)
+
+        return self.serve_calendar(
+            request,
+            calendar.Calendar().monthdatescalendar(first_day.year, first_day.month),
+            'event/tags/event_calendar_month.html',
+            {
+                'month': first_day,
+                'previous_url': self.reverse_subpage('event_calendar_month', args=(f'{previous_month:%Y}', f'{previous_month:%m}')),
+                'next_url': self.reverse_subpage('event_calendar_month', args=(f'{next_month:%Y}', f'{next_month:%m}')),
+            }
+        )
+
+    @route(r'^calendar/week/$')
+    @route(r'^calendar/(?P<year>[0-9]{4})/week/(?P<week>[0-9]{1,2})/$')
+    def event_calendar_week(self, request, year=None, week=None, name='event-calendar-week'):
+        """Serve the week agenda calendar for an ISO week at URL (eg. .../calendar/2024/week/3/); defaults to the current week"""
+        first_day = self.get_calendar_week(year, week)
+
+        previous_week = (first_day - datetime.timedelta(days=7)).isocalendar()
+        next_week = (first_day + datetime.timedelta(days=7)).isocalendar()
+
+        return self.serve_calendar(
+            request,
+            [[first_day + datetime.timedelta(days=offset) for offset in range(7)]],
+            'event/tags/event_calendar_week.html',
+            {
+                'week': int(week),
+                'previous_url': self.reverse_subpage('event_calendar_week', args=(previous_week.year, previous_week.week)),
+                'next_url': self.reverse_subpage('event_calendar_week', args=(next_week.year, next_week.week)),
+            }
+        )
+
+    @staticmethod
+    def get_calendar_month(year=None, month=None):
+        """Return the first day of the month of the URL parts (or the current month), raising a 404 for impossible months"""
         try:
-            events_paginated = paginator.page(page_num)
-        except PageNotAnInteger:
-            events_paginated = paginator.page(1)
-        except EmptyPage:
-            events_paginated = paginator.page(paginator.num_pages)
-
-        # limit page_range of the paginator (hard-coded to 3 pages both ways)
-        page_index_max = len(paginator.page_range)
-        page_index_start = max(0, page_index - 3)
-        page_index_end = min(page_index_max, page_index_start + 7)
-
-        # build new paginator ange from calculated range but also include first/last pages if not in range
-        context['paginator_range'] = []
-        if page_index_start > 0:
-            context['paginator_range'].append(1)
-        context['paginator_range'] = context['paginator_range'] + list(paginator.page_range)[page_index_start:page_index_end]
-        if page_index_end < page_index_max:
-            context['paginator_range'].append(page_index_max)
-
-        context['paginator_count'] = paginator.num_pages
-        context['events_count'] = events_count
-        context['events_paginated'] = events_paginated
-
-        return context
+            return datetime.date(int(year), int(month), 1) if year else datetime.date.today().replace(day=1)
+        except ValueError:
+            raise Http404
+
+    @staticmethod
+    def get_calendar_week(year=None, week=None):
+        """Return the Monday of the ISO week of the URL parts (or the current week), raising a 404 for impossible weeks"""
+        if not year:
+            year, week, weekday = datetime.date.today().isocalendar()
+        try:
+            return datetime.date.fromisocalendar(int(year), int(week), 1)
+        except ValueError:
+            raise Http404
+
+    def serve_calendar(self, request, weeks, calendar_template, calendar_context):
+        """
+        Render the calendar page for the given weeks (lists of dates). The occurrences for the whole visible
+        range are fetched in one query, and the rendered grid is cached against the range and a fingerprint
+        (count and newest publish time) of the live events, so any publish/unpublish renders a fresh grid.
+        """
+        start_date, end_date = weeks[0][0], weeks[-1][-1]
+        today = datetime.date.today()
+        index_root = self.get_index_root()
+
+        fingerprint = EventPage.objects.live().child_of(index_root).aggregate(
+            count=models.Count('pk'), latest=models.Max('last_published_at')
+        )
+        generation = get_listing_generation()
+        digest = hashlib.md5(
+            f'{self.pk}|{calendar_template}|{start_date}|{end_date}|{today}|{fingerprint}|{generation}'.encode('utf-8')
+        ).hexdigest()
+        cache_key = f'event:calendar:{digest}'
+
+        calendar_html = cache.get(cache_key)
+        if calendar_html is None:
+            occurrences = EventOccurrence.objects.live().child_of(index_root).between(start_date, end_date)
+            occurrences_by_date = defaultdict(list)
+            for occurrence in occurrences.select_related('event_page'):
+                occurrences_by_date[occurrence.date].append(occurrence)
+
+            calendar_context.update({
+                'page': self,
+                'today': today,
+                'weeks': [
+                    [{'date': day, 'occurrences': occurrences_by_date[day]} for day in week]
+                    for week in weeks
+                ],
+            })
+            calendar_html = render_to_string(calendar_template, calendar_context, request=request)
+            cache.set(cache_key, calendar_html, LISTING_CACHE_TIMEOUT)
+
+        # skip EventIndexPage.get_context as the paginated listing is not displayed
+        context = super().get_context(request)
+        # mark safe here as JSON serializing cache backends return a plain str
+        context['calendar_html'] = mark_safe(calendar_html)
+        return TemplateResponse(request, 'event/event_calendar_page.html', context)
 
     content_tab_panel = [
         TitleFieldPanel('title'),
@@ -388,7 +544,7 @@ class EventTypeBlock(blocks.StreamBlock):
         icon = 'cogs'
 
 
-class EventPageForm(WagtailAdminPageForm):
+class EventPageForm(SitePageForm):
     def save(self, commit=True):
         page = super().save(commit=False)
 
@@ -615,6 +771,10 @@ class EventPage(SitePage):
     subpage_types = ['article.ArticlePage']
     parent_page_types = ['event.EventIndexPage']
 
+    # images (and their renditions) batch loaded for the index listing templates, see SitePage.prefetch_listing_images
+    listing_image_fields = ('event_image',)
+    listing_filterspecs = ('fill-300x300', 'fill-600x150')
+
     # get_context:
     # Include additional values to the EventPage template context upon live rendering.
     #   (start/end dates) in_same_month, (event) running and (event) passed
@@ -626,3 +786,88 @@ class EventPage(SitePage):
         context['today_state'] = self.get_today_state()
 
         return context
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+
+        # rewrite the EventOccurrence rows from the dates StreamField (skipped for partial saves such as
+        # save_revision, which do not change the stored dates)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'dates' in update_fields:
+            EventOccurrence.update_for_page(self)
+
+
+class EventOccurrenceQuerySet(models.QuerySet):
+
+    def live(self):
+        return self.filter(event_page__live=True)
+
+    def child_of(self, page):
+        return self.filter(event_page__path__startswith=page.path, event_page__depth=page.depth + 1)
+
+    def between(self, start_date, end_date):
+        """Occurrences on or between the given dates"""
+        return self.filter(date__gte=start_date, date__lte=end_date)
+
+    def happening_at(self, when):
+        """Occurrences taking place at the given datetime"""
+        return self.filter(date=when.date(), start_time__lte=when.time(), end_time__gte=when.time())
+
+
+class EventOccurrence(models.Model):
+    """
+    One row per date/start_time/end_time of an EventPage's dates StreamField, written whenever the page
+    is saved. This lets "what is on this week/right now" queries, calendars and feeds use an indexed
+    range scan instead of decoding the dates JSON of every event page.
+
+    The rows reflect the dates stored on the page itself (ie. the live content once published), not
+    unpublished draft revisions. Use the rebuild_event_occurrences management command to backfill.
+    """
+
+    event_page = models.ForeignKey(
+        EventPage,
+        on_delete=models.CASCADE,
+        related_name='occurrences',
+    )
+
+    date = models.DateField()
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+
+    objects = EventOccurrenceQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['date', 'start_time']
+        indexes = [
+            models.Index(fields=['date', 'start_time'], name='event_occurrence_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.event_page_id}: {self.date} {self.start_time}-{self.end_time}'
+
+    @property
+    def start(self):
+        return datetime.datetime.combine(self.date, self.start_time)
+
+    @property
+    def end(self):
+        return datetime.datetime.combine(self.date, self.end_time)
+
+    @classmethod
+    def update_for_page(cls, event_page):
+        """
+        Replace the occurrences of an event page with those of its dates StreamField.
+        """
+        occurrences = [
+            cls(
+                event_page=event_page,
+                date=block.value['date'],
+                start_time=block.value['start_time'],
+                end_time=block.value['end_time'],
+            )
+            for block in event_page.dates
+            if block.block_type == 'date_block'
+        ]
+        with transaction.atomic():
+            cls.objects.filter(event_page=event_page).delete()
+            cls.objects.bulk_create(occurrences)
@@ -11,4 +11,5 @@ def event_blog_summary(context, event, show_taggit=False, taggit_slug=''):
       'event': event,
       'show_taggit': show_taggit,
       'taggit_slug': taggit_slug,
+      'request': context.get('request'),
    }
@@ -1,3 +1,51 @@
-from django.test import TestCase
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils.http import http_date
+
+from wagtail.test.utils.form_data import nested_form_data, streamfield
+
+from event.models import EventIndexPage
+from sitecore.tests import SiteTestCase
+
+
+@mock.patch('sitecore.wagtail_hooks.CONDITIONAL_GET_ENABLED', True)
+class EventCalendarConditionalGetTest(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        events = self.site.root_page.add_child(instance=EventIndexPage(title='Events', slug='events', per_page=4))
+        events.save_revision().publish()
+        self.if_modified_since = http_date(time.time() + 60)
+
+    def test_valid_routes_are_not_modified(self):
+        for path in ('/events/calendar/', '/events/calendar/2024/02/', '/events/calendar/2024/week/52/'):
+            self.assertEqual(self.client.get(path, HTTP_IF_MODIFIED_SINCE=self.if_modified_since).status_code, 304, path)
+
+    def test_rejected_routes_are_not_answered_with_304(self):
+        for path in ('/events/calendar/2024/13/', '/events/calendar/2023/week/53/'):
+            self.assertEqual(self.client.get(path, HTTP_IF_MODIFIED_SINCE=self.if_modified_since).status_code, 404, path)
+
+
+class EventIndexReservedSlugTest(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.events = self.site.root_page.add_child(instance=EventIndexPage(title='Events', slug='events'))
+
+    def test_route_slugs_are_reserved_under_event_index(self):
+        for slug in ('calendar', 'ical'):
+            events = EventIndexPage.objects.get(pk=self.events.pk)
+            with self.assertRaises(ValidationError), transaction.atomic():
+                events.add_child(instance=EventIndexPage(title='Sub events', slug=slug))
+        # not reserved under other parents
+        self.site.root_page.add_child(instance=EventIndexPage(title='Calendar', slug='calendar'))
+
+    def test_admin_form_rejects_reserved_slug(self):
+        form_class = EventIndexPage.get_edit_handler().get_form_class()
+        data = nested_form_data({'title': 'Calendar', 'slug': 'calendar', 'intro': streamfield([])})
+        form = form_class(data, instance=EventIndexPage(), parent_page=self.events)
+        self.assertFalse(form.is_valid())
+        self.assertIn('reserved', str(form.errors['slug']))
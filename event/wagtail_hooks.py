@@ -1,10 +1,11 @@
 
 from django.contrib import admin
 
+from wagtail import hooks
 from wagtail.contrib.modeladmin.options import (
     ModelAdmin, modeladmin_register)
 
-from .models import EventPage
+from .models import EventIndexPage, EventPage
 
 
 @admin.display(description='Event Type')
@@ -70,3 +71,20 @@ class EventPageWagtailAdmin(ModelAdmin):
     
 # Now you just need to register your customised ModelAdmin class with Wagtail
 modeladmin_register(EventPageWagtailAdmin)
+
+
+@hooks.register('register_static_export_listing_pages')
+def event_index_listing_pages(parent):
+    """
+    This hook adds the event index pages listing the events under another page (index_root_page) to the
+    pages the static export re-renders when one of those events changes.
+    """
+    return list(EventIndexPage.objects.live().filter(index_root_page=parent))
+
+
+@hooks.register('register_rendition_filter_specs')
+def event_rendition_filter_specs():
+    """
+    This hook adds the event page and event index banner image to the renditions generated on image upload.
+    """
+    return ['fill-1200x300']
@@ -255,3 +255,6 @@ class HomePage(SitePage):
     # restrict HomePage model to being a HomePage ONLY
     
     parent_page_types = ['wagtailcore.Page']
+
+    # top level slugs shadowed by the URL patterns siteconfig/urls.py matches ahead of the page tree
+    reserved_child_slugs = ('_images', 'admin', 'api', 'django-admin', 'documents', 'gallery-images', 'login', 'logout')
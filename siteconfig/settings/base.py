@@ -82,6 +82,7 @@ MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
 
     'wagtail.contrib.redirects.middleware.RedirectMiddleware',
+    'sitecore.middleware.IdentityMapMiddleware',
 ]
 
 ROOT_URLCONF = 'siteconfig.urls'
@@ -167,7 +168,9 @@ STATICFILES_DIRS = [
 # ManifestStaticFilesStorage is recommended in production, to prevent outdated
 # Javascript / CSS assets being served from cache (e.g. after a Wagtail upgrade).
 # See https://docs.djangoproject.com/en/2.2/ref/contrib/staticfiles/#manifeststaticfilesstorage
-STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'
+# CompressedManifestStaticFilesStorage also writes .gz (and .br, with the Brotli package) variants of the
+# text assets for the front end server to serve precompressed.
+STATICFILES_STORAGE = 'sitecore.storage.CompressedManifestStaticFilesStorage'
 
 # LML: Including this breaks ./manage.py collectstatic as the static files are found 'here' and via siteconfig as an INSTALLED_APPS leading to duplicates
 # LML: Option is use separate app for project level templates, tags, static or leave like this.
@@ -191,6 +194,8 @@ WAGTAIL_USER_EDIT_FORM = 'siteuser.forms.CustomUserEditForm'
 WAGTAIL_USER_CREATION_FORM = 'siteuser.forms.CustomUserCreationForm'
 
 WAGTAILIMAGES_IMAGE_MODEL = 'sitecore.SiteImage'
+# store a capped size master of large (and HEIF) uploads, see sitecore/ingestion.py
+WAGTAILIMAGES_IMAGE_FORM_BASE = 'sitecore.forms.SiteImageForm'
 WAGTAIL_USER_CUSTOM_FIELDS = ['bio', 'team', 'job_title', 'country', 'twitter', 'receive_submission_notify_email']
 
 LOGIN_REDIRECT_URL = '/'
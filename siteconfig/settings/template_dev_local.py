@@ -114,4 +114,4 @@ SHORT_DATETIME_FORMAT = 'd/m/y H:i'
 
 LOGGING = { "version": 1, "disable_existing_loggers": False, "formatters": {"rich": {"datefmt": "[%X]"}}, "handlers": { "console": { "class": "rich.logging.RichHandler", "formatter": "rich", "level": "DEBUG", "rich_tracebacks": True, } }, "loggers": { "django": {"handlers": ["console"]} }, }
 
-WAGTAILIMAGES_EXTENSIONS = ["gif", "jpg", "jpeg", "png", "webp", "svg"]
\ No newline at end of file
+WAGTAILIMAGES_EXTENSIONS = ["gif", "jpg", "jpeg", "png", "webp", "svg", "heic"]
\ No newline at end of file
@@ -11,6 +11,8 @@ from wagtail.documents import urls as wagtaildocs_urls
 
 from wagtailautocomplete.urls.admin import urlpatterns as autocomplete_admin_urls
 
+from sitecore.views import GalleryImagesView, ImageServeView
+
 from .api import api_router
 
 urlpatterns = [
@@ -23,6 +25,9 @@ urlpatterns = [
     re_path(r'^logout/$', auth_views.LogoutView.as_view(template_name = 'sitecore/registration/logout.html'), name='logout'),
 
     re_path(r'^documents/', include(wagtaildocs_urls)),
+    # under a prefix of its own, so a top level 'images' page keeps its subpaths (see HomePage.reserved_child_slugs)
+    re_path(r'^_images/([^/]*)/(\d*)/([^/]*)/[^/]*$', ImageServeView.as_view(), name='sitecore_image_serve'),
+    re_path(r'^gallery-images/$', GalleryImagesView.as_view(), name='sitecore_gallery_images'),
 
     re_path(r'', include(wagtail_urls)),
 ]
@@ -5,5 +5,7 @@ class SitecoreConfig(AppConfig):
     name = 'sitecore'
 
     def ready(self):
+        import sitecore.receivers
+
         if settings.ENABLE_LDAP:
             import sitecore.signals
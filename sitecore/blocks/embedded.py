@@ -1,21 +1,33 @@
+from django.conf import settings
+from django.core import signing
 from django.core.validators import MinValueValidator, validate_comma_separated_integer_list
 from django.db import models
+from django.urls import reverse
+from django.utils.http import urlencode
 from django.utils.translation import gettext_lazy as _
 
 from wagtail.admin.panels import FieldPanel, FieldRowPanel, MultiFieldPanel, ObjectList, TabbedInterface
 from wagtail import blocks
 from wagtail.fields import StreamField, RichTextField
 from wagtail.documents.blocks import DocumentChooserBlock
+from wagtail.images import get_image_model
 from wagtail.images.blocks import ImageChooserBlock
 from wagtail.snippets.blocks import SnippetChooserBlock
 from wagtail.snippets.models import register_snippet
 
 from sitecore import constants
+from sitecore.cache import is_static_export_request
+from sitecore.image_serve import IMAGE_SERVE_DYNAMIC
+from sitecore.renditions import get_responsive_filter_specs
 
 from .links import LinkBlock
 from .text import BSHeadingBlock, BSBlockquoteBlock, CodeBlock
 
 
+# gallery images rendered with the page; the rest are fetched in pages by the gallery images view
+GALLERY_EAGER_IMAGES = getattr(settings, 'SITECORE_GALLERY_EAGER_IMAGES', 12)
+GALLERY_PAGE_SIZE = getattr(settings, 'SITECORE_GALLERY_PAGE_SIZE', 24)
+
 
 class CarouselSimpleSlideBlock(blocks.StructBlock):
     """
@@ -255,6 +267,60 @@ class GalleryBlock(blocks.StructBlock):
         label = 'Gallery'
         template = 'sitecore/blocks/gallery_block.html'
 
+    signing_salt = 'sitecore.blocks.gallery'
+
+    def get_context(self, value, parent_context=None):
+        """
+        Render the first GALLERY_EAGER_IMAGES images (with their renditions batch loaded) and link the rest
+        to the gallery images view, which renders them in pages as the visitor scrolls. The static export
+        has no such view, so exported pages render every image.
+        """
+        context = super().get_context(value, parent_context=parent_context)
+        images = [image for image in value['gallery_images'] if image]
+        eager_images = len(images)
+        if not is_static_export_request((parent_context or {}).get('request')):
+            eager_images = GALLERY_EAGER_IMAGES
+        context['gallery_images'] = self.prefetch_renditions(images[:eager_images], value['gallery_type'])
+        context['gallery_next_url'] = None
+        if len(images) > eager_images:
+            context['gallery_next_url'] = self.get_page_url(self.get_token(images[eager_images:], value), 1)
+        return context
+
+    @staticmethod
+    def prefetch_renditions(images, filter_spec):
+        """
+        Batch load the renditions of the images for the responsive renditions (width ladder and formats) of
+        the filter spec in a single query, so the responsive_rendition tag only creates the missing ones.
+        Returns the images.
+        """
+        if images and not IMAGE_SERVE_DYNAMIC:
+            Rendition = get_image_model().get_rendition_model()
+            filter_specs = [spec for format, specs in get_responsive_filter_specs(filter_spec) for spec in specs]
+            models.prefetch_related_objects(images, models.Prefetch(
+                'renditions',
+                queryset=Rendition.objects.filter(filter_spec__in=filter_specs),
+                to_attr='prefetched_renditions',
+            ))
+        return images
+
+    @classmethod
+    def get_token(cls, images, value):
+        # signed, so the view only renders images (and filter specs) a gallery has shown
+        return signing.dumps({
+            'images': [image.pk for image in images],
+            'filter_spec': value['gallery_type'],
+            'title': bool(value['gallery_image_title']),
+            'caption': bool(value['gallery_image_caption']),
+        }, salt=cls.signing_salt, compress=True)
+
+    @classmethod
+    def load_token(cls, token):
+        return signing.loads(token, salt=cls.signing_salt)
+
+    @staticmethod
+    def get_page_url(token, page):
+        return reverse('sitecore_gallery_images') + '?' + urlencode({'gallery': token, 'page': page})
+
 
 
 class IconCardStructValue(blocks.StructValue):
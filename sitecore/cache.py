@@ -0,0 +1,218 @@
+"""
+Sitecore cache module for implementing the publish-invalidated page response cache used for anonymous
+traffic to SitePage derived pages (including their RoutablePageMixin routes), the ETag/Last-Modified
+validators for conditional GETs of the same pages, and the opt-in fragment cache for expensive
+CoreBlock/SplashBlock children. Cached page bodies are stored gzip compressed and sent as is (with
+Content-Encoding: gzip) to clients that accept it.
+:Copyright: Research IT, IT Services, The University of Manchester
+"""
+import base64
+import datetime
+import gzip
+import hashlib
+import json
+import re
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.utils.safestring import mark_safe
+
+
+PAGE_CACHE_ENABLED = getattr(settings, 'SITECORE_PAGE_CACHE', not settings.DEBUG)
+PAGE_CACHE_TIMEOUT = getattr(settings, 'SITECORE_PAGE_CACHE_TIMEOUT', 60 * 10)
+PAGE_CACHE_GENERATION = 'page'
+# store the cached page bodies gzip compressed (typically 5-10x smaller)
+PAGE_CACHE_COMPRESS = getattr(settings, 'SITECORE_PAGE_CACHE_COMPRESS', True)
+PAGE_CACHE_COMPRESS_LEVEL = getattr(settings, 'SITECORE_PAGE_CACHE_COMPRESS_LEVEL', 6)
+
+CONDITIONAL_GET_ENABLED = getattr(settings, 'SITECORE_CONDITIONAL_GET', True)
+
+BLOCK_CACHE_ENABLED = getattr(settings, 'SITECORE_BLOCK_CACHE', False)
+BLOCK_CACHE_ALIAS = getattr(settings, 'SITECORE_BLOCK_CACHE_ALIAS', 'default')
+BLOCK_CACHE_TIMEOUT = getattr(settings, 'SITECORE_BLOCK_CACHE_TIMEOUT', 60 * 60)
+# fragments larger than this (in characters) are rendered every time rather than filling the cache
+BLOCK_CACHE_MAX_SIZE = getattr(settings, 'SITECORE_BLOCK_CACHE_MAX_SIZE', 256 * 1024)
+# set on the requests of the static site export (see sitecore/static_export.py), which render pages
+# without relying on dynamic endpoints (e.g., the paged gallery images)
+STATIC_EXPORT_ENVIRON_KEY = 'sitecore.static_export'
+
+# carousel is not cached by default as its slides add CSS to the page through sekizai
+BLOCK_CACHE_TYPES = getattr(settings, 'SITECORE_BLOCK_CACHE_TYPES', (
+    'code', 'gallery', 'icon_card_deck', 'nested_content', 'two_cols',
+))
+
+
+def is_static_export_request(request):
+    return request is not None and bool(request.META.get(STATIC_EXPORT_ENVIRON_KEY))
+
+
+def bump_page_cache_generation():
+    """
+    Invalidate every cached page response (and validator) at once. Publishing any page can change the
+    menus, listings and related content shown on many other pages, so the whole cache is invalidated
+    rather than tracking which responses depend on which pages. The generation is kept in the database
+    (see CacheGeneration), so it is shared by every process whatever the cache backend.
+    """
+    from sitecore.models import CacheGeneration
+
+    CacheGeneration.bump(PAGE_CACHE_GENERATION)
+
+
+def get_page_cache_generation():
+    """
+    Return the (generation, timestamp of the last change that invalidated the page cache).
+    """
+    from sitecore.models import CacheGeneration
+
+    row = CacheGeneration.get(PAGE_CACHE_GENERATION)
+    return row.generation, int(row.modified.timestamp())
+
+
+def is_anonymous_page_request(page, request):
+    return (
+        getattr(page, 'cache_page_response', False)
+        and request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+        and not page.get_view_restrictions().exists()
+    )
+
+
+def is_cacheable_response(response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not response.has_header('Cache-Control')
+    )
+
+
+def get_page_cache_key(site, request):
+    """
+    Key the response on the site, path and query string, plus the date (for date filtered listings) and the
+    cache generation (bumped on publish/unpublish).
+    """
+    generation, _ = get_page_cache_generation()
+    digest = hashlib.md5(
+        f'{site.pk}|{request.path}|{request.GET.urlencode()}|{datetime.date.today()}|{generation}'.encode('utf-8')
+    ).hexdigest()
+    return f'sitecore:page:{digest}'
+
+
+def get_page_validators(page, request, serve_args, serve_kwargs):
+    """
+    Return the (ETag, Last-Modified timestamp) validators for a page response. Last-Modified is the newer
+    of the page's own last modified time (see SitePage.get_last_modified) and the last site wide change
+    (menus, listings and snippets shown on the page); the ETag also covers the path, query string and date.
+    Returns None when the page has no last modified time e.g., for a route its view would reject.
+    """
+    page_modified = page.get_last_modified(request, *serve_args, **serve_kwargs)
+    if page_modified is None:
+        return None
+    generation, site_modified = get_page_cache_generation()
+    last_modified = max(site_modified, int(page_modified.timestamp()))
+    etag = hashlib.md5(
+        f'{page.pk}|{request.path}|{request.GET.urlencode()}|{datetime.date.today()}|{site_modified}|{generation}|{page_modified}'.encode('utf-8')
+    ).hexdigest()
+    # weak, as the same ETag is sent for the gzip encoded and identity responses (see get_cached_response)
+    return f'W/"{etag}"', last_modified
+
+
+def set_page_validators(response, etag, last_modified):
+    # leave any validators set by the view itself (e.g., the event iCalendar feed)
+    if response.status_code == 200 and not response.has_header('ETag'):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+
+
+accepts_gzip_re = re.compile(r'\bgzip\b')
+
+
+def accepts_gzip(request):
+    return bool(accepts_gzip_re.search(request.META.get('HTTP_ACCEPT_ENCODING', '')))
+
+
+def get_cached_response(cache_key, request):
+    """
+    Return the cached response, or None on a miss. Compressed bodies are sent without decompressing to
+    clients that accept gzip, and decompressed for the others.
+    """
+    cached = cache.get(cache_key)
+    if cached is None:
+        return None
+    if cached.get('encoding') != 'gzip':
+        return HttpResponse(cached['content'], content_type=cached['content_type'], status=cached['status'])
+
+    content = base64.b64decode(cached['content'])
+    if accepts_gzip(request):
+        response = HttpResponse(content, content_type=cached['content_type'], status=cached['status'])
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(gzip.decompress(content), content_type=cached['content_type'], status=cached['status'])
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def set_cached_response(cache_key, response):
+    # responses are stored as plain values so JSON serializing backends (eg. django-redis) can hold them,
+    # hence compressed bodies are base64 encoded
+    if PAGE_CACHE_COMPRESS:
+        content = base64.b64encode(
+            gzip.compress(response.content, compresslevel=PAGE_CACHE_COMPRESS_LEVEL, mtime=0)
+        ).decode('ascii')
+        encoding = 'gzip'
+    else:
+        content = response.content.decode(response.charset)
+        encoding = None
+    cache.set(cache_key, {
+        'content': content,
+        'encoding': encoding,
+        'content_type': response['Content-Type'],
+        'status': response.status_code,
+    }, PAGE_CACHE_TIMEOUT)
+    if PAGE_CACHE_COMPRESS:
+        # later requests for the same URL may be answered with either encoding
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+
+def get_block_cache_key(bound_block, request, extra_context):
+    """
+    Key a block fragment on its stream block id and a hash of its content, plus the context passed to it
+    by the stream template, the site (for page URLs), the page cache generation (so publishing pages or
+    editing snippets and images referenced by id also refreshes the fragments) and the static export flag.
+    """
+    content = json.dumps(
+        bound_block.block.get_prep_value(bound_block.value), cls=DjangoJSONEncoder, sort_keys=True
+    )
+    host = request.get_host() if request is not None else ''
+    generation, _ = get_page_cache_generation()
+    export = is_static_export_request(request)
+    digest = hashlib.md5(
+        f'{bound_block.block_type}|{content}|{sorted(extra_context.items())}|{host}|{generation}|{export}'.encode('utf-8')
+    ).hexdigest()
+    return f'sitecore:block:{getattr(bound_block, "id", None)}:{digest}'
+
+
+def render_cached_block(bound_block, context, extra_context):
+    """
+    Render a stream child with the extra context (as include_block does), from the fragment cache when the
+    block type is listed in SITECORE_BLOCK_CACHE_TYPES.
+    """
+    def render():
+        return bound_block.render_as_block(context={**context.flatten(), **extra_context})
+
+    if not BLOCK_CACHE_ENABLED or bound_block.block_type not in BLOCK_CACHE_TYPES:
+        return render()
+
+    block_cache = caches[BLOCK_CACHE_ALIAS]
+    cache_key = get_block_cache_key(bound_block, context.get('request'), extra_context)
+    html = block_cache.get(cache_key)
+    if html is None:
+        html = render()
+        if len(html) <= BLOCK_CACHE_MAX_SIZE:
+            block_cache.set(cache_key, str(html), BLOCK_CACHE_TIMEOUT)
+    # mark safe here as JSON serializing cache backends return a plain str
+    return mark_safe(html)
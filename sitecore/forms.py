@@ -0,0 +1,16 @@
+from wagtail.images.forms import BaseImageForm
+
+from sitecore.ingestion import get_master_image
+
+
+class SiteImageForm(BaseImageForm):
+    """
+    Image add/edit form base (see WAGTAILIMAGES_IMAGE_FORM_BASE) that passes new uploads through the
+    ingestion stage, so a capped size master is stored in place of large or HEIF originals.
+    """
+
+    def clean_file(self):
+        f = self.cleaned_data.get('file')
+        if f and 'file' in self.changed_data:
+            return get_master_image(f) or f
+        return f
@@ -0,0 +1,112 @@
+"""
+Sitecore identity module for implementing the request scoped identity map of the Site, root page, site
+settings and resolved page URLs, so repeated lookups within one request/render are only loaded once.
+The map is held in a contextvar (set by the IdentityMapMiddleware) so each thread and each asyncio task
+sees only its own request's objects. Outside a request (e.g., management commands) nothing is cached.
+:Copyright: Research IT, IT Services, The University of Manchester
+"""
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from wagtail.models import Page, Site
+
+
+logger = logging.getLogger(__name__)
+
+_identity_map = ContextVar('sitecore_identity_map', default=None)
+
+AFTER_REQUEST_KEY = ('after_request', None)
+
+
+@contextmanager
+def identity_map():
+    """
+    Start a new, empty identity map for the enclosed block (restoring the previous one on exit).
+    """
+    token = _identity_map.set({})
+    try:
+        yield
+    finally:
+        _identity_map.reset(token)
+
+
+def get_or_load(key, loader):
+    """
+    Return the object held in the current identity map for key, calling loader() to load it on a miss.
+    Without an active identity map the loader is always called.
+    """
+    objects = _identity_map.get()
+    if objects is None:
+        return loader()
+    try:
+        return objects[key]
+    except KeyError:
+        value = objects[key] = loader()
+        return value
+
+
+def call_after_request(func):
+    """
+    Call func once the current request's response has been generated i.e., after the view and every
+    transaction.on_commit() callback it queued have run. Outside a request func is called immediately.
+    """
+    objects = _identity_map.get()
+    if objects is None:
+        func()
+    else:
+        objects.setdefault(AFTER_REQUEST_KEY, []).append(func)
+
+
+def run_after_request_callbacks():
+    objects = _identity_map.get()
+    callbacks = objects.pop(AFTER_REQUEST_KEY, []) if objects is not None else []
+    for func in callbacks:
+        # the response is already generated (and its changes committed), so log failures rather than
+        # turning it into an error, and still run the remaining callbacks
+        try:
+            func()
+        except Exception:
+            logger.exception('After request callback %r failed', func)
+
+
+def get_site(request=None):
+    # Site.find_for_request() already caches the site on the request object
+    site = Site.find_for_request(request) if request is not None else None
+    if site is None:
+        site = get_or_load(('site', None), lambda: Site.objects.get(is_default_site=True))
+    return site
+
+
+def get_page(page_id):
+    return get_or_load(('page', page_id), lambda: Page.objects.get(pk=page_id))
+
+
+def get_page_url(page, request=None):
+    # URLs are relative to the request's site, which is fixed for the lifetime of the identity map
+    return get_or_load(('page_url', page.pk), lambda: page.get_url(request))
+
+
+def get_slug_url(slug, request=None):
+    """
+    Return the URL of the page with the given slug; the same lookup as the slugurl tag (this site first,
+    then any site).
+    """
+    def load():
+        site = get_site(request)
+        page = Page.objects.in_site(site).filter(slug=slug).first() or Page.objects.filter(slug=slug).first()
+        return get_page_url(page, request) if page else None
+
+    return get_or_load(('slug_url', slug), load)
+
+
+class IdentityMappedSettingMixin:
+    """
+    Site setting mixin to load each setting once per site within the current identity map, including the
+    for_site() lookups made outside BaseSiteSetting.for_request() (which only caches on the request).
+    """
+
+    @classmethod
+    def for_site(cls, site):
+        load = super().for_site
+        return get_or_load(('setting', cls._meta.label, site.pk), lambda: load(site))
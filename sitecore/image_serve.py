@@ -0,0 +1,139 @@
+"""
+Sitecore image serve module for implementing dynamic image URLs. A signed (image, filter spec) URL is
+served by ImageServeView, which makes the image on the first request, keeps it in a disk cache and hands
+the file to the front end server with X-Accel-Redirect. With SITECORE_IMAGE_SERVE_DYNAMIC on, the rendition
+tags emit these URLs (see DynamicRendition), so page renders don't open the image with Pillow or read the
+renditions table. The view is mounted at /_images/ rather than /images/, so it does not shadow a top level
+page slugged 'images'. The cache of an image is removed when its file or focal point changes. e.g., for
+nginx with SITECORE_IMAGE_SERVE_ACCEL_PREFIX = '/image-cache/':
+
+    location /image-cache/ {
+        internal;
+        alias /path/to/media/image-cache/;
+        expires 1h;
+    }
+
+:Copyright: Research IT, IT Services, The University of Manchester
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.forms.utils import flatatt
+from django.utils.safestring import mark_safe
+
+from sitecore.renditions import get_filter
+
+
+IMAGE_SERVE_DYNAMIC = getattr(settings, 'SITECORE_IMAGE_SERVE_DYNAMIC', False)
+IMAGE_SERVE_CACHE_ROOT = getattr(settings, 'SITECORE_IMAGE_SERVE_CACHE_ROOT', os.path.join(settings.MEDIA_ROOT, 'image-cache'))
+# internal location the front end server maps to the cache root; None serves the files from Django
+IMAGE_SERVE_ACCEL_PREFIX = getattr(settings, 'SITECORE_IMAGE_SERVE_ACCEL_PREFIX', None)
+IMAGE_SERVE_MAX_AGE = getattr(settings, 'SITECORE_IMAGE_SERVE_MAX_AGE', 60 * 60)
+
+FORMAT_EXTENSIONS = {
+    'avif': 'avif',
+    'gif': 'gif',
+    'ico': 'ico',
+    'jpeg': 'jpg',
+    'png': 'png',
+    'svg': 'svg',
+    'webp': 'webp',
+}
+
+
+def get_image_serve_url(image, filter_spec):
+    from wagtail.images.views.serve import generate_image_url
+
+    return generate_image_url(image, filter_spec, viewname='sitecore_image_serve')
+
+
+def get_cache_dir(image_id):
+    return os.path.join(IMAGE_SERVE_CACHE_ROOT, str(image_id))
+
+
+def get_cache_link(image_id, filter_spec):
+    # the filter spec (e.g., fill-300x300|format-webp) isn't a safe file name, so its digest is used
+    return os.path.join(get_cache_dir(image_id), hashlib.sha1(filter_spec.encode()).hexdigest())
+
+
+def find_cached_image(image_id, filter_spec):
+    """
+    Return the path (relative to the cache root) of the cached image for the filter spec, or None. The
+    cache holds a symlink named by the spec digest to the file (named with its extension), so a hit is a
+    single readlink.
+    """
+    try:
+        name = os.readlink(get_cache_link(image_id, filter_spec))
+    except OSError:
+        return None
+    return f'{image_id}/{name}'
+
+
+def cache_image(image, filter_spec):
+    """
+    Make the image for the filter spec (as a rendition, but without a renditions row) and write it to the
+    cache, returning its path relative to the cache root. Files and links are written to temporary names
+    and renamed, so concurrent requests for the same image never see a partial file.
+    """
+    output = BytesIO()
+    willow = get_filter(filter_spec).run(image, output)
+    link = get_cache_link(image.pk, filter_spec)
+    name = f'{os.path.basename(link)}.{FORMAT_EXTENSIONS.get(willow.format_name, willow.format_name)}'
+
+    directory = get_cache_dir(image.pk)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(output.getvalue())
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, os.path.join(directory, name))
+        os.symlink(name, temp_path)
+        os.replace(temp_path, link)
+    except BaseException:
+        if os.path.lexists(temp_path):
+            os.remove(temp_path)
+        raise
+    return f'{image.pk}/{name}'
+
+
+def remove_cached_images(image_id):
+    shutil.rmtree(get_cache_dir(image_id), ignore_errors=True)
+
+
+class DynamicRendition:
+    """
+    Stands in for a rendition in templates (url, width, height, alt, attrs and img_tag) with the URL of the
+    image serve view. The size is worked out from the image's stored dimensions and focal point, without
+    opening the file or creating a renditions row.
+    """
+
+    def __init__(self, image, filter_spec):
+        self.image = image
+        self.filter_spec = filter_spec
+        self.width, self.height = get_filter(filter_spec).get_transform(image).size
+        self.url = get_image_serve_url(image, filter_spec)
+
+    @property
+    def alt(self):
+        return self.image.default_alt_text
+
+    @property
+    def attrs(self):
+        return flatatt(self.attrs_dict)
+
+    @property
+    def attrs_dict(self):
+        return {'src': self.url, 'width': self.width, 'height': self.height, 'alt': self.alt}
+
+    def img_tag(self, extra_attributes=None):
+        attrs = self.attrs_dict.copy()
+        attrs.update(extra_attributes or {})
+        return mark_safe(f'<img{flatatt(attrs)}>')
+
+    def __html__(self):
+        return self.img_tag()
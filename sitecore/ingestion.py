@@ -0,0 +1,168 @@
+"""
+Sitecore ingestion module for implementing the downscale-on-upload stage of SiteImage files. Uploads
+larger than the master size (e.g., 50 megapixel phone photos) are replaced by a capped size master, and
+HEIF/HEIC uploads are converted to JPEG once, so later rendition jobs decode a much smaller source. Files
+that would need more memory to decode than the memory budget are rejected. The same stage is used by the
+import_images command.
+:Copyright: Research IT, IT Services, The University of Manchester
+"""
+import hashlib
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template.defaultfilters import filesizeformat
+
+from wagtail.utils.file import hash_filelike
+
+from PIL import Image
+
+try:
+    # colour management needs Pillow built with LittleCMS
+    from PIL import ImageCms
+except ImportError:
+    ImageCms = None
+
+try:
+    # registers the HEIF/HEIC and AVIF openers with Pillow
+    from pillow_heif import AvifImagePlugin, HeifImagePlugin  # noqa: F401
+except ImportError:
+    pass
+
+
+# longest side (in pixels) of the stored master image; 0 keeps uploads at their original size
+IMAGE_MASTER_SIZE = getattr(settings, 'SITECORE_IMAGE_MASTER_SIZE', 4096)
+IMAGE_MASTER_QUALITY = getattr(settings, 'SITECORE_IMAGE_MASTER_QUALITY', 90)
+# most memory (in bytes) an upload may need to decode, after any reduced size JPEG decoding
+IMAGE_MEMORY_BUDGET = getattr(settings, 'SITECORE_IMAGE_MEMORY_BUDGET', 256 * 1024 * 1024)
+# formats converted (to JPEG, or PNG with transparency) on upload, whatever their size
+IMAGE_CONVERT_FORMATS = getattr(settings, 'SITECORE_IMAGE_CONVERT_FORMATS', ('HEIF',))
+
+# EXIF orientation to the transpose that displays the image upright (as ImageOps.exif_transpose)
+ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+
+def get_master_format(image):
+    # PNG and WebP masters keep their format; others are stored as JPEG unless they have transparency
+    if image.format in ('PNG', 'WEBP'):
+        return image.format
+    return 'PNG' if image.has_transparency_data else 'JPEG'
+
+
+def convert_to_rgb(image, icc_profile):
+    """
+    Convert an image (e.g., a CMYK JPEG) to RGB, returning it with the ICC profile to save it with. An
+    embedded profile describes the original mode, so the pixels are transformed from it to sRGB (and
+    saved without a profile, as browsers assume sRGB) or, if the profile can't be used, the plain
+    converted image is saved without one.
+    """
+    if icc_profile and ImageCms is not None:
+        try:
+            source = ImageCms.ImageCmsProfile(BytesIO(icc_profile))
+            return ImageCms.profileToProfile(image, source, ImageCms.createProfile('sRGB'), outputMode='RGB'), None
+        except (ImageCms.PyCMSError, OSError):
+            pass
+    return image.convert('RGB'), None
+
+
+def get_master_image(f):
+    """
+    Return an uploaded file holding the master image for an image file, or None when the file can be
+    stored as is (no larger than IMAGE_MASTER_SIZE and not in an IMAGE_CONVERT_FORMATS format). Animated
+    and vector images are always stored as is. Raises ValidationError if decoding would exceed the memory
+    budget.
+
+    JPEGs are decoded in draft mode (scaled by 1/2 to 1/8 in the decoder) to the smallest size no smaller
+    than the master. The EXIF orientation is applied to the pixels, as the master is saved without EXIF.
+    """
+    f.seek(0)
+    try:
+        image = Image.open(f)
+    except (OSError, Image.DecompressionBombError):
+        # not a raster image Pillow can read (e.g., SVG); Wagtail validates the file
+        return None
+
+    with image:
+        too_large = IMAGE_MASTER_SIZE and max(image.size) > IMAGE_MASTER_SIZE
+        if getattr(image, 'is_animated', False) or not (too_large or image.format in IMAGE_CONVERT_FORMATS):
+            return None
+
+        master_size = (IMAGE_MASTER_SIZE, IMAGE_MASTER_SIZE) if too_large else image.size
+        master_format = get_master_format(image)
+        orientation = image.getexif().get(0x0112)
+        icc_profile = image.info.get('icc_profile')
+        if image.format == 'JPEG':
+            image.draft('RGB' if image.mode not in ('L', 'CMYK') else image.mode, master_size)
+
+        decode_bytes = image.width * image.height * len(image.getbands())
+        if decode_bytes > IMAGE_MEMORY_BUDGET:
+            raise ValidationError(
+                'This image is too large to process (%(width)s x %(height)s pixels needs %(size)s). '
+                'Please resize it before uploading.',
+                code='image_memory_budget',
+                params={'width': image.width, 'height': image.height, 'size': filesizeformat(decode_bytes)},
+            )
+
+        # reducing_gap resizes in two steps (a fast reduce and then the resample) for large reductions
+        image.thumbnail(master_size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        if orientation in ORIENTATION_TRANSPOSE:
+            image = image.transpose(ORIENTATION_TRANSPOSE[orientation])
+        if master_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image, icc_profile = convert_to_rgb(image, icc_profile)
+
+        output = BytesIO()
+        options = {'icc_profile': icc_profile} if icc_profile else {}
+        if master_format in ('JPEG', 'WEBP'):
+            options['quality'] = IMAGE_MASTER_QUALITY
+        image.save(output, master_format, optimize=True, **options)
+
+    extension = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp'}[master_format]
+    name = os.path.splitext(os.path.basename(f.name))[0] + extension
+    return SimpleUploadedFile(name, output.getvalue(), content_type=Image.MIME[master_format])
+
+
+def prepare_image_file(path):
+    """
+    Read an image file for import (in a worker process): hash it while streaming (as Wagtail's file_hash),
+    read its dimensions and pass it through the ingestion stage. Returns a dict of the path, the hashes of
+    the file and of the content to store (the master, or the original file), the name, content and
+    dimensions, or of the path and error.
+    """
+    try:
+        with open(path, 'rb') as f:
+            file_hash = hash_filelike(f)
+            master = get_master_image(f)
+            if master is None:
+                f.seek(0)
+                with Image.open(f) as image:
+                    width, height = image.size
+                f.seek(0)
+                name, content = os.path.basename(path), f.read()
+            else:
+                name, content = master.name, master.read()
+                with Image.open(BytesIO(content)) as image:
+                    width, height = image.size
+    except ValidationError as e:
+        return {'path': path, 'error': ' '.join(e.messages)}
+    except (OSError, Image.DecompressionBombError) as e:
+        return {'path': path, 'error': str(e)}
+
+    return {
+        'path': path,
+        'hash': file_hash,
+        'master_hash': hashlib.sha1(content).hexdigest() if master is not None else file_hash,
+        'name': name,
+        'content': content,
+        'width': width,
+        'height': height,
+    }
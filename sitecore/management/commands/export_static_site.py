@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from wagtail.models import Site
+
+from sitecore.static_export import STATIC_EXPORT_ROOT, StaticExporter
+
+
+class Command(BaseCommand):
+    help = 'Render every live SitePage (with its listing pages and routes) to static HTML files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--root', default=STATIC_EXPORT_ROOT,
+            help='Directory to write the export to (default: SITECORE_STATIC_EXPORT_ROOT)',
+        )
+        parser.add_argument(
+            '--site', dest='hostname',
+            help='Only export the site with this hostname (default: all sites)',
+        )
+
+    def handle(self, *args, **options):
+        if not options['root']:
+            raise CommandError('Set SITECORE_STATIC_EXPORT_ROOT or pass --root')
+
+        site = None
+        if options['hostname']:
+            site = Site.objects.filter(hostname=options['hostname']).first()
+            if site is None:
+                raise CommandError(f'No site with hostname "{options["hostname"]}"')
+
+        count = StaticExporter(options['root']).export_site(site)
+        self.stdout.write(f'Exported {count} files to {options["root"]}')
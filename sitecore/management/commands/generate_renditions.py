@@ -0,0 +1,45 @@
+from concurrent.futures import as_completed
+
+from django.core.management.base import BaseCommand
+
+from wagtail.images import get_image_model
+
+from sitecore.renditions import RENDITION_WORKERS, generate_renditions, get_executor, get_rendition_filter_specs
+
+
+class Command(BaseCommand):
+    help = 'Generate any missing renditions of existing images for the filter specs the site uses.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=RENDITION_WORKERS or 1,
+            help='Number of worker processes (default: SITECORE_RENDITION_WORKERS, or 1)',
+        )
+        parser.add_argument(
+            '--spec', dest='filter_specs', action='append',
+            help='Only generate this filter spec (may be repeated; default: all registered specs)',
+        )
+        parser.add_argument(
+            '--missing', action='store_true',
+            help='Only images without a placeholder i.e., never processed (e.g., dropped from the queue at a restart)',
+        )
+        parser.add_argument(
+            'image_ids', nargs='*', type=int,
+            help='Only generate renditions of these images (default: all images)',
+        )
+
+    def handle(self, *args, **options):
+        filter_specs = options['filter_specs'] or get_rendition_filter_specs()
+        image_ids = get_image_model().objects.order_by('pk').values_list('pk', flat=True)
+        if options['image_ids']:
+            image_ids = image_ids.filter(pk__in=options['image_ids'])
+        if options['missing']:
+            # SVG images have no placeholder
+            image_ids = image_ids.filter(placeholder='').exclude(file__iendswith='.svg')
+
+        count = 0
+        with get_executor(max_workers=options['workers']) as executor:
+            futures = [executor.submit(generate_renditions, image_id, filter_specs) for image_id in image_ids.iterator()]
+            for future in as_completed(futures):
+                count += future.result()
+        self.stdout.write(f'Generated/checked {count} renditions of {len(futures)} images ({", ".join(filter_specs)})')
@@ -0,0 +1,176 @@
+import csv
+import json
+import os
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from wagtail.images import get_image_model
+from wagtail.images.fields import get_allowed_image_extensions
+from wagtail.models import Collection
+from wagtail.search.backends import get_search_backends
+
+from sitecore.ingestion import prepare_image_file
+from sitecore.renditions import PREGENERATE_RENDITIONS, RENDITION_WORKERS, generate_renditions, get_executor
+
+
+class Command(BaseCommand):
+    help = (
+        'Import image files from a directory (recursively) or a manifest (a text file of paths, or a CSV '
+        'file with a "file" column), skipping duplicates of existing images. Re-running the same import '
+        'resumes it.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'source',
+            help='Directory or manifest file to import',
+        )
+        parser.add_argument(
+            '--metadata',
+            help='CSV file with a "file" column (path or file name) and any of "title", "alt_text" and "caption"',
+        )
+        parser.add_argument(
+            '--collection', type=int,
+            help='Id of the collection to import into (default: the root collection)',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=RENDITION_WORKERS or 1,
+            help='Number of worker processes reading the files (default: SITECORE_RENDITION_WORKERS, or 1)',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Number of images to read and insert at a time (default: 100)',
+        )
+        parser.add_argument(
+            '--state',
+            help='File recording the imported paths, to resume from (default: <source>.import-state)',
+        )
+
+    def get_paths(self, source):
+        extensions = tuple(
+            f'.{extension}' for extension in get_allowed_image_extensions() if extension != 'svg'
+        )
+        if os.path.isdir(source):
+            for root, dirs, files in os.walk(source):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(extensions):
+                        yield os.path.join(root, name)
+            return
+
+        base = os.path.dirname(os.path.abspath(source))
+        with open(source, newline='', encoding='utf-8') as f:
+            if source.lower().endswith('.csv'):
+                paths = (row['file'] for row in csv.DictReader(f))
+            else:
+                paths = (line.strip() for line in f)
+            for path in paths:
+                if path and not path.startswith('#'):
+                    yield os.path.join(base, path)
+
+    def get_metadata(self, metadata_file, source):
+        """
+        Return the sidecar CSV rows keyed by both the file's path (relative to the source) and its name.
+        """
+        if not metadata_file:
+            return {}
+        base = source if os.path.isdir(source) else os.path.dirname(os.path.abspath(source))
+        metadata = {}
+        with open(metadata_file, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                metadata[os.path.normpath(os.path.join(base, row['file']))] = row
+                metadata.setdefault(os.path.basename(row['file']), row)
+        return metadata
+
+    def read_state(self, state_file):
+        done = set()
+        if os.path.exists(state_file):
+            with open(state_file, encoding='utf-8') as f:
+                for line in f:
+                    done.add(json.loads(line)['path'])
+        return done
+
+    def get_batches(self, paths, done, batch_size):
+        batch = []
+        for path in paths:
+            if os.path.normpath(path) not in done:
+                batch.append(path)
+                if len(batch) == batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    def handle(self, *args, **options):
+        source = os.path.abspath(options['source'])
+        if not os.path.exists(source):
+            raise CommandError(f'"{source}" does not exist')
+
+        Image = get_image_model()
+        if options['collection']:
+            collection = Collection.objects.filter(pk=options['collection']).first()
+            if collection is None:
+                raise CommandError(f'No collection with id {options["collection"]}')
+        else:
+            collection = Collection.get_first_root_node()
+
+        metadata = self.get_metadata(options['metadata'], source)
+        state_file = options['state'] or os.path.normpath(source) + '.import-state'
+        done = self.read_state(state_file)
+        known_hashes = set(Image.objects.exclude(file_hash='').values_list('file_hash', flat=True))
+
+        imported = skipped = failed = 0
+        with get_executor(max_workers=options['workers']) as executor, open(state_file, 'a', encoding='utf-8') as state:
+            for batch in self.get_batches(self.get_paths(source), done, options['batch_size']):
+                images = []
+                records = []
+                for result in executor.map(prepare_image_file, batch):
+                    path = os.path.normpath(result['path'])
+                    if 'error' in result:
+                        # not recorded, so the file is tried again when the import is resumed
+                        self.stderr.write(f'{path}: {result["error"]}')
+                        failed += 1
+                        continue
+                    # compare both the original and the stored master (e.g., uploaded through the admin)
+                    if result['hash'] in known_hashes or result['master_hash'] in known_hashes:
+                        records.append({'path': path, 'hash': result['hash'], 'duplicate': True})
+                        skipped += 1
+                        continue
+                    known_hashes.update((result['hash'], result['master_hash']))
+
+                    row = metadata.get(path) or metadata.get(os.path.basename(path)) or {}
+                    title = row.get('title') or os.path.splitext(os.path.basename(path))[0].replace('_', ' ').replace('-', ' ')
+                    image = Image(
+                        title=title,
+                        alt_text=row.get('alt_text') or title,
+                        caption=row.get('caption', ''),
+                        collection=collection,
+                        file=ContentFile(result['content'], name=result['name']),
+                        width=result['width'],
+                        height=result['height'],
+                        file_size=len(result['content']),
+                        file_hash=result['master_hash'],
+                    )
+                    images.append(image)
+                    records.append({'path': path, 'hash': result['hash']})
+
+                # the image files are written to storage as the rows are inserted
+                with transaction.atomic():
+                    Image.objects.bulk_create(images)
+                imported += len(images)
+
+                for backend in get_search_backends():
+                    backend.add_bulk(Image, images)
+                if PREGENERATE_RENDITIONS:
+                    # bulk_create sends no post_save, so queue the renditions here (waited for on exit)
+                    for image in images:
+                        executor.submit(generate_renditions, image.pk)
+
+                for record in records:
+                    state.write(json.dumps(record) + '\n')
+                state.flush()
+                self.stdout.write(f'{imported} imported, {skipped} duplicates skipped, {failed} failed')
+
+        self.stdout.write(f'Imported {imported} images ({skipped} duplicates skipped, {failed} failed)')
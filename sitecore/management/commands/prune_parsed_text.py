@@ -0,0 +1,44 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from sitecore.models import ParsedText
+from sitecore.parsers import get_referenced_parsed_text_digests
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete the stored ParsedText rows no longer referenced by the current content (the text of pages, '
+        'snippets and settings, and the latest and live revisions).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report the unreferenced rows',
+        )
+        parser.add_argument(
+            '--min-age', type=int, default=24,
+            help='Keep rows created within this many hours e.g., validated content not yet saved (default: 24)',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of rows to delete at a time (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        referenced = get_referenced_parsed_text_digests()
+        total = ParsedText.objects.count()
+        created_before = timezone.now() - datetime.timedelta(hours=options['min_age'])
+        candidates = ParsedText.objects.filter(created_at__lt=created_before)
+
+        stale = [digest for digest in candidates.values_list('digest', flat=True).iterator() if digest not in referenced]
+        if not options['dry_run']:
+            for start in range(0, len(stale), options['batch_size']):
+                with transaction.atomic():
+                    ParsedText.objects.filter(digest__in=stale[start:start + options['batch_size']]).delete()
+
+        action = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(f'{action} {len(stale)} of {total} parsed texts')
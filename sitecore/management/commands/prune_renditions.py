@@ -0,0 +1,79 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from wagtail.images import get_image_model
+
+from sitecore.renditions import get_filter, get_reachable_filter_specs
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete the renditions (and their files) no longer reachable from the templates, blocks and filter '
+        'spec choices, or made for an image\'s previous focal point. Reachability is per filter spec, so '
+        'an image keeps the renditions of every reachable spec.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report the stale renditions',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of renditions to read and delete at a time (default: 500)',
+        )
+        parser.add_argument(
+            '--keep', dest='keep_specs', action='append', default=[],
+            help='Also keep renditions of this filter spec (may be repeated)',
+        )
+
+    def is_stale(self, rendition, reachable_specs):
+        if rendition.filter_spec not in reachable_specs:
+            return True
+        # renditions of a focal point dependent spec (e.g., fill) made before the focal point was changed
+        return rendition.focal_point_key != get_filter(rendition.filter_spec).get_cache_key(rendition.image)
+
+    def get_size(self, rendition):
+        try:
+            return rendition.file.size
+        except OSError:
+            return 0
+
+    def delete(self, stale_ids):
+        Rendition = get_image_model().get_rendition_model()
+        # the Wagtail post_delete handlers remove the files (on commit) and the cached renditions
+        with transaction.atomic():
+            Rendition.objects.filter(pk__in=stale_ids).delete()
+
+    def handle(self, *args, **options):
+        reachable_specs = get_reachable_filter_specs() | set(options['keep_specs'])
+        Rendition = get_image_model().get_rendition_model()
+        renditions = Rendition.objects.select_related('image').order_by('pk')
+
+        counts = Counter()
+        sizes = Counter()
+        checked = 0
+        last_pk = 0
+        while True:
+            # page on the primary key, so rows deleted between batches don't shift the pages
+            batch = list(renditions.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            checked += len(batch)
+
+            stale = [rendition for rendition in batch if self.is_stale(rendition, reachable_specs)]
+            for rendition in stale:
+                counts[rendition.filter_spec] += 1
+                sizes[rendition.filter_spec] += self.get_size(rendition)
+            if stale and not options['dry_run']:
+                self.delete([rendition.pk for rendition in stale])
+
+        for filter_spec, count in counts.most_common():
+            self.stdout.write(f'{filter_spec}: {count} renditions, {sizes[filter_spec] / 1024 / 1024:.1f} MB')
+        action = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(
+            f'{action} {sum(counts.values())} of {checked} renditions ({sum(sizes.values()) / 1024 / 1024:.1f} MB)'
+        )
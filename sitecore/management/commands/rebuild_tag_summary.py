@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from sitecore.models import SiteTagSummary
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized SiteTagSummary rows used by the SiteTagIndexPage tag cloud.'
+
+    def handle(self, *args, **options):
+        SiteTagSummary.rebuild()
+        self.stdout.write(f'Rebuilt tag summary for {SiteTagSummary.objects.count()} tags')
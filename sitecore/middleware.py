@@ -0,0 +1,30 @@
+"""
+Sitecore middleware module for scoping the identity map (see sitecore/identity.py) to each request.
+:Copyright: Research IT, IT Services, The University of Manchester
+"""
+from asgiref.sync import iscoroutinefunction, sync_to_async
+
+from django.utils.decorators import sync_and_async_middleware
+
+from sitecore.identity import identity_map, run_after_request_callbacks
+
+
+@sync_and_async_middleware
+def IdentityMapMiddleware(get_response):
+    """
+    Start an empty identity map for each request, under both WSGI (per thread) and ASGI (per task) workers,
+    and run any work deferred by call_after_request() once the response has been generated.
+    """
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            with identity_map():
+                response = await get_response(request)
+                await sync_to_async(run_after_request_callbacks)()
+                return response
+    else:
+        def middleware(request):
+            with identity_map():
+                response = get_response(request)
+                run_after_request_callbacks()
+                return response
+    return middleware
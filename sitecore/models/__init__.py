@@ -1,5 +1,7 @@
+from .cache_generation import CacheGeneration
+from .parsed_text import ParsedText
 from .search_index import SiteSearchIndexPage
-from .settings import SiteSettings
+from .settings import EmailSettings, SiteSettings
 from .siteimage import SiteImage, SiteRendition
-from .sitepage import SitePageTags, SitePage
+from .sitepage import SitePageForm, SitePageTags, SitePage, SiteTagSummary
 from .tag_index import SiteTagIndexPage
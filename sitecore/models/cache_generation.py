@@ -0,0 +1,47 @@
+from django.db import models
+from django.utils import timezone
+
+from sitecore.identity import get_or_load
+
+
+class CacheGeneration(models.Model):
+    """
+    Named generation counters (and when each was last bumped) for invalidating the page response, menu and
+    listing caches at once. They are kept in the database rather than the cache, so a bump made by the
+    process handling a publish is seen by every other web worker (and the export worker pool) even when
+    the cache backend is per process (e.g., the default locmem cache). The rows are read once per request.
+    """
+    name = models.CharField(
+        max_length=32,
+        primary_key=True,
+    )
+
+    generation = models.PositiveBigIntegerField(
+        default=0,
+    )
+
+    modified = models.DateTimeField(
+        default=timezone.now,
+    )
+
+    def __str__(self):
+        return f'{self.name}: {self.generation}'
+
+    @classmethod
+    def bump(cls, name):
+        now = timezone.now()
+        if not cls.objects.filter(name=name).update(generation=models.F('generation') + 1, modified=now):
+            _, created = cls.objects.get_or_create(name=name, defaults={'generation': 1, 'modified': now})
+            if not created:
+                cls.objects.filter(name=name).update(generation=models.F('generation') + 1, modified=now)
+
+    @classmethod
+    def get(cls, name):
+        """
+        Return the row for name, loading every row once per request (see sitecore.identity). A missing row
+        is created with the current time, so validators issued before it existed are not matched.
+        """
+        rows = get_or_load(('cache_generations', None), lambda: {row.name: row for row in cls.objects.all()})
+        if name not in rows:
+            rows[name], _ = cls.objects.get_or_create(name=name)
+        return rows[name]
@@ -0,0 +1,23 @@
+from django.db import models
+
+
+class ParsedText(models.Model):
+    """
+    Content addressed store of the HTML produced by the shortcode and markdown/shortcode parsers. The digest
+    is a hash of the parser type and version plus the source text, so rows never go stale: edited content
+    gets a new digest and is parsed (and stored) when it is validated on Save Draft/Publish. On page render
+    the stored HTML is emitted without running the markdown and shortcode pipeline again.
+    """
+    digest = models.CharField(
+        max_length=64,
+        primary_key=True,
+    )
+
+    html = models.TextField()
+
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+    )
+
+    def __str__(self):
+        return self.digest
@@ -3,7 +3,6 @@ Sitecore models module for implementing the search index page
 :Authors: Louise Lever <louise.lever@manchester.ac.uk>
 :Copyright: Research IT, IT Services, The University of Manchester
 """
-from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from django.utils.translation import gettext_lazy as _
@@ -15,6 +14,7 @@ from wagtail.fields import StreamField
 from wagtail.search.models import Query
 
 from sitecore import blocks as sitecore_blocks
+from sitecore.pagination import IndexPaginator
 
 from .sitepage import SitePage
 
@@ -34,6 +34,9 @@ class SiteSearchIndexPage(SitePage):
         ('right', 'Single sidebar (To right of main content)'),
         ('none', 'No sidebars'),
     )
+
+    # search queries record a hit on every request, so never serve them from the page response cache
+    cache_page_response = False
     
     intro = StreamField(
         sitecore_blocks.CoreBlock,
@@ -109,46 +112,26 @@ class SiteSearchIndexPage(SitePage):
         if search_terms:
             search_query = Query.get(search_terms)
             results_all = SitePage.objects.live().specific().order_by('-first_published_at').search(search_terms)
-            results_count = len(results_all)
             url_params = f'query={search_terms}'
             # Record hit
             search_query.add_hit()
         else:
             results_all = SitePage.objects.none()
-            results_count = 0
             url_params = ''
 
         # (2) If we have some results, paginate them based on model settings
+        # Search backend results are not keyset-able; the paginator falls back to count() and offsets
         if results_all is not None:
-            paginator = Paginator(results_all, self.per_page)
-            page_num = request.GET.get('page', 1)
-            page_index = int(page_num)-1 if page_num is not None else 0
-        
-            # get list of results for the desired paginator page
-            try:
-                results_paginated = paginator.page(page_num)
-            except PageNotAnInteger:
-                results_paginated = paginator.page(1)
-            except EmptyPage:
-                results_paginated = paginator.page(paginator.num_pages)
-
-            # limit page_range of the paginator (hard-coded to 3 pages both ways)
-            page_index_max = len(paginator.page_range)
-            page_index_start = max(0, page_index - 3)
-            page_index_end = min(page_index_max, page_index_start + 7)
-
-            # pass total number of pages
-            context['paginator_count'] = paginator.num_pages
+            paginator = IndexPaginator(results_all, self.per_page)
+            results_paginated = paginator.get_page(request.GET.get('page', 1))
+            results_count = paginator.count
 
-            # build new paginator ange from calculated range but also include first/last pages if not in range
-            context['paginator_range'] = []
-            if page_index_start > 0:
-                context['paginator_range'].append(1)
-            context['paginator_range'] = context['paginator_range'] + list(paginator.page_range)[page_index_start:page_index_end]
-            if page_index_end < page_index_max:
-                context['paginator_range'].append(page_index_max)
+            # pass total number of pages and the limited page_range of the paginator
+            context['paginator_count'] = paginator.num_pages
+            context['paginator_range'] = paginator.get_page_window(results_paginated.number)
         else:
             results_paginated = None
+            results_count = 0
             context['paginator_count'] = 0
             context['paginator_range'] = None
 
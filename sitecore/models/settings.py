@@ -12,12 +12,13 @@ from wagtail.models import Site
 from wagtail.fields import RichTextField
 
 from sitecore import constants
+from sitecore.identity import IdentityMappedSettingMixin
 
 # from siteconfig.settings.local import DEFAULT_FROM_EMAIL
 
 
 @register_setting(icon = 'mail')
-class EmailSettings(BaseSiteSetting):
+class EmailSettings(IdentityMappedSettingMixin, BaseSiteSetting):
 
         def get_context(self, request):
             context = super().get_context(request)
@@ -50,7 +51,7 @@ class EmailSettings(BaseSiteSetting):
         
 
 @register_setting
-class SiteSettings(BaseSiteSetting):
+class SiteSettings(IdentityMappedSettingMixin, BaseSiteSetting):
     """
     This registers new site settings options (per site) in the Wagtail admin panels.
     Limited functionality is provided here to set the (Bootstrap 4) theme.
@@ -65,6 +66,9 @@ class SiteSettings(BaseSiteSetting):
     class Meta:
         verbose_name = 'Customization'
 
+    # the brand logo is shown in the navbar of every page
+    select_related = ['brand_logo']
+
 
     bootstrap_theme = models.CharField(
         max_length = 32,
@@ -20,6 +20,12 @@ class SiteImage(AbstractImage):
         help_text='Caption for photo credits or extra information.',
         )
 
+    placeholder = models.TextField(
+        blank=True,
+        editable=False,
+        help_text='Tiny blurred version of the image (as a data URI) shown while the image loads.',
+        )
+
     admin_form_fields = Image.admin_form_fields + (
         # Then add the field names here to make them appear in the form:
         'alt_text',
@@ -1,13 +1,21 @@
 """
 Sitecore models module for implementing the superclass SitePage model to share commonalities
-across all derived Page based models.
+across all derived Page based models, and the materialized usage summary of its shared tag cloud.
 :Authors: Louise Lever <louise.lever@manchester.ac.uk>
 :Copyright: Research IT, IT Services, The University of Manchester
 """
 
-from django.db import models
+import math
+from collections import defaultdict
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import prefetch_related_objects
+from django.http import Http404
 from django.utils.translation import gettext_lazy as _
 
+from wagtail.admin.forms import WagtailAdminPageForm
 from wagtail.admin.panels import FieldPanel
 from wagtail.models import Page
 
@@ -16,6 +24,8 @@ from modelcluster.tags import ClusterTaggableManager
 
 from taggit.models import Tag, TaggedItemBase
 
+from .siteimage import SiteImage
+
 
 class SitePageTags(TaggedItemBase):
     """
@@ -27,6 +37,23 @@ class SitePageTags(TaggedItemBase):
     content_object = ParentalKey('SitePage', related_name='tagged_site_pages')
 
 
+class SitePageForm(WagtailAdminPageForm):
+    """
+    Admin page form base for SitePage models, rejecting a slug reserved by the parent page's routes
+    (see SitePage.reserved_child_slugs). The model clean() makes the same check, but only once the
+    page is in the tree, so a new page would otherwise fail on save rather than in the form.
+    """
+
+    def clean(self):
+        cleaned_data = super().clean()
+        page_slug = cleaned_data.get('slug')
+        if page_slug and SitePage._slug_is_reserved(page_slug, self.parent_page):
+            self.add_error('slug', forms.ValidationError(
+                _("The slug '%(page_slug)s' is reserved by the parent page") % {'page_slug': page_slug}
+            ))
+        return cleaned_data
+
+
 class SitePage(Page):
     """
     Creates a new superclass SitePage derived from the Wagtail default Page model. This enables
@@ -64,6 +91,23 @@ class SitePage(Page):
         help_text=_("Provide text to override the default title used to generate the menu label")
     )
     
+    # allow anonymous responses to be served from the page response cache (see sitecore/cache.py)
+    cache_page_response = True
+
+    # index pages listing their children include the newest child publish time in Last-Modified
+    last_modified_from_children = False
+
+    # RoutablePageMixin route views (by name) mapped to the method that checks their arguments, raising a
+    # 404 as the view would (see is_valid_route)
+    route_checks = {}
+
+    # child slugs that would be shadowed by the RoutablePageMixin routes of this page (eg. 'calendar/')
+    reserved_child_slugs = ()
+
+    # image fields (and renditions) batch loaded for index listings; set by derived models
+    listing_image_fields = ()
+    listing_filterspecs = ()
+
     # pass through existing Page.search_fields
     search_fields = Page.search_fields
 
@@ -81,3 +125,161 @@ class SitePage(Page):
     promote_panels = Page.promote_panels + [
         FieldPanel('menu_label'),
     ]
+
+    base_form_class = SitePageForm
+
+    @staticmethod
+    def _slug_is_reserved(slug, parent_page):
+        return parent_page is not None and slug in getattr(parent_page.specific_class, 'reserved_child_slugs', ())
+
+    def clean(self):
+        super().clean()
+        parent_page = self.get_parent()
+        if self._slug_is_reserved(self.slug, parent_page):
+            raise ValidationError({
+                'slug': _("The slug '%(page_slug)s' is reserved by the parent page at '%(parent_url_path)s'") % {
+                    'page_slug': self.slug, 'parent_url_path': parent_page.url,
+                }
+            })
+
+    @staticmethod
+    def prefetch_listing_images(pages):
+        """
+        Batch load the listing_image_fields of a page of (specific) listed pages along with their
+        listing_filterspecs renditions, so a listing costs a fixed number of queries per page model
+        rather than several per listed page. Returns the pages as a list.
+        """
+        pages = list(pages)
+        pages_by_model = defaultdict(list)
+        for page in pages:
+            if getattr(page, 'listing_image_fields', None):
+                pages_by_model[type(page)].append(page)
+
+        for model, model_pages in pages_by_model.items():
+            images = SiteImage.objects.prefetch_renditions(*model.listing_filterspecs)
+            prefetch_related_objects(
+                model_pages,
+                *[models.Prefetch(field_name, queryset=images) for field_name in model.listing_image_fields]
+            )
+        return pages
+
+    def get_last_modified(self, request, *args, **kwargs):
+        """
+        Return when the content of this page (or route of a RoutablePageMixin page, as args holds the route
+        view) last changed, for the ETag/Last-Modified validators of conditional GETs (see sitecore/cache.py).
+        Returns None, so no 304 is answered, for a route its view would reject.
+        """
+        if not self.is_valid_route(*args):
+            return None
+        last_modified = self.last_published_at
+        if self.last_modified_from_children:
+            latest = self.get_children().live().aggregate(latest=models.Max('last_published_at'))['latest']
+            if latest and (last_modified is None or latest > last_modified):
+                last_modified = latest
+        return last_modified
+
+    def is_valid_route(self, view=None, view_args=(), view_kwargs=None):
+        """
+        Check the arguments of a route view with its route_checks method. The validators are worked out
+        before the view runs, so a route the view would reject with a 404 (eg. an impossible date) must not
+        be answered with a 304.
+        """
+        check = self.route_checks.get(getattr(view, '__name__', None))
+        if check:
+            try:
+                getattr(self, check)(*view_args, **(view_kwargs or {}))
+            except Http404:
+                return False
+        return True
+
+    def get_static_export_paths(self):
+        """
+        Return the paths (relative to this page's URL, with a ?page= query for further listing pages) that
+        the static site export renders for this page (see sitecore/static_export.py). Index pages extend
+        this with their pagination and RoutablePageMixin listing routes.
+        """
+        return ['']
+
+    @staticmethod
+    def get_paginated_paths(path, count, per_page):
+        """
+        Return the path of every page of a listing of count items (the first page has no ?page= query).
+        """
+        num_pages = max(1, math.ceil(count / per_page))
+        return [path] + [f'{path}?page={number}' for number in range(2, num_pages + 1)]
+
+
+class SiteTagSummary(models.Model):
+    """
+    Materialized usage summary of the shared SitePage tag cloud: one row per tag holding its slug, name
+    and the number of live SitePages using it. This serves the SiteTagIndexPage tag cloud from a single
+    indexed read instead of loading every SitePageTags row and annotating counts on each request.
+
+    Rows are refreshed by the receivers in sitecore/receivers.py when pages are published or unpublished,
+    when page tags are added/removed and when tags are edited. rebuild() recalculates every row (see the
+    rebuild_tag_summary management command).
+    """
+
+    tag = models.OneToOneField(
+        Tag,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='site_summary',
+    )
+
+    slug = models.SlugField(max_length=100, db_index=True)
+    name = models.CharField(max_length=100)
+
+    # named to match the num_tags annotation expected by the taggit_list tag template
+    num_tags = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['slug']
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def get_tag_cloud(cls):
+        return cls.objects.filter(num_tags__gt=0).order_by('slug')
+
+    @classmethod
+    def count_live_pages(cls, tag_ids=None):
+        """
+        Return {tag_id: number of live SitePages} for the given tags (or all tags) in one query.
+        """
+        items = SitePageTags.objects.filter(content_object__live=True)
+        if tag_ids is not None:
+            items = items.filter(tag_id__in=tag_ids)
+        return dict(
+            items.values('tag_id').annotate(count=models.Count('content_object', distinct=True)).values_list('tag_id', 'count')
+        )
+
+    @classmethod
+    def refresh(cls, tag_ids):
+        """
+        Recalculate the summary rows of the given tags only.
+        """
+        tag_ids = set(tag_ids)
+        if not tag_ids:
+            return
+        counts = cls.count_live_pages(tag_ids)
+        for tag in Tag.objects.filter(pk__in=tag_ids):
+            cls.objects.update_or_create(
+                tag=tag,
+                defaults={'slug': tag.slug, 'name': tag.name, 'num_tags': counts.get(tag.pk, 0)},
+            )
+
+    @classmethod
+    def rebuild(cls):
+        """
+        Recalculate the summary rows of every tag used by a SitePage.
+        """
+        counts = cls.count_live_pages()
+        tag_ids = SitePageTags.objects.values_list('tag_id', flat=True).distinct()
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(
+                cls(tag=tag, slug=tag.slug, name=tag.name, num_tags=counts.get(tag.pk, 0))
+                for tag in Tag.objects.filter(pk__in=tag_ids)
+            )
@@ -6,7 +6,6 @@ a superclass SitePage model to share commonalities, and support for tag indexing
 """
 
 from django.core.exceptions import ObjectDoesNotExist
-from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from django.http import Http404
@@ -19,10 +18,11 @@ from wagtail.contrib.routable_page.models import route, RoutablePageMixin
 from wagtail.fields import StreamField
 
 from sitecore import blocks as sitecore_blocks
+from sitecore.pagination import IndexPaginator
 
 from taggit.models import Tag
 
-from .sitepage import SitePage, SitePageTags
+from .sitepage import SitePage, SiteTagSummary
 
 class SiteTagIndexPage(RoutablePageMixin, SitePage):
     """
@@ -109,55 +109,34 @@ class SiteTagIndexPage(RoutablePageMixin, SitePage):
         context = super().get_context(request)
 
         # (1) Produce tag cloud based only managed by SitePageTags (and ignore tags in other models)
-        # Get tag_id of all SitePageTags; use that as filter against pk in (all) Tag.objects()
-        site_page_tag_ids = [t.tag_id for t in SitePageTags.objects.all()]
-        tags_all = Tag.objects.filter(pk__in=site_page_tag_ids).order_by('slug').annotate(num_tags=models.Count('sitecore_sitepagetags_items'))
+        # Read from the materialized SiteTagSummary (tag slug, name and live page count)
+        tags_all = SiteTagSummary.get_tag_cloud()
 
         # (2) Retrieve all site pages that match tag (if slug provided)
         if slug:
             try:
                 tag_name = Tag.objects.get(slug=slug)
-                results_all = SitePage.objects.live().filter(tags__slug=slug).order_by('-first_published_at')
-                results_count = len(results_all)
+                results_all = SitePage.objects.live().filter(tags__slug=slug)
             except ObjectDoesNotExist as e:
                 raise Http404(f'Tag Slug "{slug}" does not exist')
         else:
             tag_name = None
             results_all = None
-            results_count = 0
 
         # (3) If we have some results, paginate them based on model settings
         if results_all is not None:
-            # get the paginator obj and the current page number
-            paginator = Paginator(results_all, self.per_page)
-            page_num = request.GET.get('page')
-            page_index = int(page_num)-1 if page_num is not None else 0
-        
-            # get list of results for the desired paginator page
-            try:
-                results_paginated = paginator.page(page_num)
-            except PageNotAnInteger:
-                results_paginated = paginator.page(1)
-            except EmptyPage:
-                results_paginated = paginator.page(paginator.num_pages)
-
-            # limit page_range of the paginator (hard-coded to 3 pages both ways)
-            page_index_max = len(paginator.page_range)
-            page_index_start = max(0, page_index - 3)
-            page_index_end = min(page_index_max, page_index_start + 7)
-
-            # pass total number of pages
-            context['paginator_count'] = paginator.num_pages
+            paginator = IndexPaginator(results_all, self.per_page, ordering='-first_published_at')
+            results_paginated = paginator.get_page(request.GET.get('page'))
+            # fetch the page of results as their specific types and batch load their listing images
+            results_paginated.object_list = SitePage.prefetch_listing_images(results_paginated.object_list.specific())
+            results_count = paginator.count
 
-            # build new paginator ange from calculated range but also include first/last pages if not in range
-            context['paginator_range'] = []
-            if page_index_start > 0:
-                context['paginator_range'].append(1)
-            context['paginator_range'] = context['paginator_range'] + list(paginator.page_range)[page_index_start:page_index_end]
-            if page_index_end < page_index_max:
-                context['paginator_range'].append(page_index_max)
+            # pass total number of pages and the limited page_range of the paginator
+            context['paginator_count'] = paginator.num_pages
+            context['paginator_range'] = paginator.get_page_window(results_paginated.number)
         else:
             results_paginated = None
+            results_count = 0
             context['paginator_count'] = 0
             context['paginator_range'] = None
             
@@ -183,6 +162,22 @@ class SiteTagIndexPage(RoutablePageMixin, SitePage):
         )
 
 
+    def get_static_export_paths(self, tag_slugs=None):
+        """
+        Add the (paginated) routes of every used tag, or with tag_slugs only the routes of those tags (e.g.,
+        the tags of a published page) along with the tag cloud.
+        """
+        paths = super().get_static_export_paths()
+        if tag_slugs is None:
+            num_tags = dict(SiteTagSummary.objects.filter(num_tags__gt=0).values_list('slug', 'num_tags'))
+        else:
+            num_tags = dict.fromkeys(sorted(tag_slugs), 0)
+            num_tags.update(SiteTagSummary.objects.filter(slug__in=tag_slugs).values_list('slug', 'num_tags'))
+        for slug, count in num_tags.items():
+            paths += self.get_paginated_paths(f'{slug}/', count, self.per_page)
+        return paths
+
+
     # render template
 
     template = 'sitecore/taggit/index_page.html'
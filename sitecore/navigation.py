@@ -0,0 +1,84 @@
+"""
+Sitecore navigation module for implementing the cached per-site menu tree used by the top_menu and
+top_menu_children tags (navbar items, their dropdown children and the search page link).
+:Copyright: Research IT, IT Services, The University of Manchester
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from wagtail.models import Page
+
+from sitecore.identity import get_site, get_slug_url
+
+
+MENU_CACHE_TIMEOUT = getattr(settings, 'SITECORE_MENU_CACHE_TIMEOUT', 60 * 60 * 24)
+MENU_GENERATION = 'menu'
+
+
+def bump_menu_generation():
+    """
+    Invalidate the menu trees of every site at once; called when pages are published, unpublished, moved,
+    deleted or have show_in_menus changed. The generation is shared by every process (see CacheGeneration).
+    """
+    from sitecore.models import CacheGeneration
+
+    CacheGeneration.bump(MENU_GENERATION)
+
+
+def build_menu_tree(root_page, request):
+    """
+    Build the menu tree (live, in menu children of the site root and their own live, in menu children)
+    from a single path ordered query. Items are plain dicts so the tree can be stored by JSON serializing
+    cache backends.
+    """
+    pages = (
+        Page.objects.descendant_of(root_page)
+        .filter(depth__lte=root_page.depth + 2)
+        .live().in_menu()
+        .annotate(menu_label=F('sitepage__menu_label'))
+        .order_by('path')
+    )
+
+    menuitems = []
+    items_by_path = {}
+    for page in pages:
+        item = {
+            'id': page.pk,
+            'title': page.title,
+            'menu_label': page.menu_label or '',
+            'url': page.get_url(request),
+            'url_path': page.url_path,
+            'children': [],
+        }
+        if page.depth == root_page.depth + 1:
+            menuitems.append(item)
+            items_by_path[page.path] = item
+        else:
+            # children of pages that are not live or not in menus are skipped (as get_children() would)
+            parent = items_by_path.get(page.path[:-Page.steplen])
+            if parent is not None:
+                parent['children'].append(item)
+
+    return {
+        'menuitems': menuitems,
+        'search_url': get_slug_url('search', request),
+    }
+
+
+def get_menu_tree(root_page, request=None):
+    """
+    Return the cached menu tree for the root page, keyed on the site (page URLs are relative to it) and
+    the menu generation.
+    """
+    from sitecore.models import CacheGeneration
+
+    site = get_site(request)
+    generation = CacheGeneration.get(MENU_GENERATION).generation
+    cache_key = f'sitecore:menu:{site.pk}:{root_page.pk}:{generation}'
+
+    tree = cache.get(cache_key)
+    if tree is None:
+        tree = build_menu_tree(root_page, request)
+        cache.set(cache_key, tree, MENU_CACHE_TIMEOUT)
+    return tree
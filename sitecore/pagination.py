@@ -0,0 +1,160 @@
+"""
+Sitecore pagination module for implementing the shared listing paginator used by all index pages
+(articles, events, tags and search results).
+:Copyright: Research IT, IT Services, The University of Manchester
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, FieldDoesNotExist
+from django.core.paginator import Paginator
+from django.db.models import Count, Max, Q, QuerySet
+from django.utils.functional import cached_property
+
+
+LISTING_CACHE_TIMEOUT = getattr(settings, 'SITECORE_LISTING_CACHE_TIMEOUT', 60 * 60)
+LISTING_GENERATION = 'listing'
+
+# number of page links shown either side of the current page (plus first/last pages)
+PAGE_RANGE_WINDOW = 3
+
+
+def bump_listing_generation():
+    """
+    Invalidate every cached listing (counts and page boundaries) at once. This is only needed for changes
+    that do not alter the listing fingerprint (count and newest publish time) e.g., re-ordering pages in
+    the admin explorer, which changes the 'path' ordering without publishing anything. The generation is
+    shared by every process (see CacheGeneration).
+    """
+    from sitecore.models import CacheGeneration
+
+    CacheGeneration.bump(LISTING_GENERATION)
+
+
+def get_listing_generation():
+    from sitecore.models import CacheGeneration
+
+    return CacheGeneration.get(LISTING_GENERATION).generation
+
+
+class IndexPaginator(Paginator):
+    """
+    Paginator shared by the index pages. Replaces the per-model copies of the Paginator block and:
+
+    1) counts with a single aggregate (COUNT plus the newest last_published_at) rather than evaluating
+       the whole queryset with len()
+    2) uses keyset (seek) pagination when an ordering field is given, so a deep page is fetched with an
+       indexed "WHERE key > boundary LIMIT per_page" query rather than a growing OFFSET
+    3) provides the windowed page range used by the index_pagination tag
+
+    The keyset boundaries (the ordering key of the last row on each page) are built once from a
+    two-column values_list() and cached against the listing SQL and its fingerprint, so any publish,
+    unpublish or delete that changes the listing produces a new cache entry.
+
+    Querysets without an ordering field (or non-queryset results such as search backends) fall back to
+    the standard count()/offset behaviour of the Django Paginator.
+    """
+
+    def __init__(self, object_list, per_page, ordering=None, **kwargs):
+        self.ordering = ordering if isinstance(object_list, QuerySet) and ordering else None
+        if self.ordering:
+            # add the primary key as a tie-breaker so rows sharing a key value have a stable order
+            tie_breaker = '-pk' if self.ordering.startswith('-') else 'pk'
+            object_list = object_list.order_by(self.ordering, tie_breaker)
+        super().__init__(object_list, per_page, **kwargs)
+
+    @property
+    def is_keyset(self):
+        return self.ordering is not None
+
+    @property
+    def order_field(self):
+        return self.ordering.lstrip('-')
+
+    @cached_property
+    def fingerprint(self):
+        """
+        Single aggregate query returning the listing count and newest publish time (for page querysets).
+        """
+        aggregates = {'count': Count('pk')}
+        try:
+            self.object_list.model._meta.get_field('last_published_at')
+            aggregates['latest'] = Max('last_published_at')
+        except FieldDoesNotExist:
+            pass
+        return self.object_list.order_by().aggregate(**aggregates)
+
+    @cached_property
+    def count(self):
+        if self.is_keyset:
+            return self.fingerprint['count']
+        return super().count
+
+    def get_cache_key(self, suffix):
+        try:
+            sql = str(self.object_list.query)
+        except EmptyResultSet:
+            sql = ''
+        generation = get_listing_generation()
+        digest = hashlib.md5(
+            f'{sql}|{self.per_page}|{self.fingerprint}|{generation}'.encode('utf-8')
+        ).hexdigest()
+        return f'sitecore:listing:{suffix}:{digest}'
+
+    def get_boundaries(self):
+        """
+        Return the (key, pk) pair of the last row on every page, built from a values_list() of the
+        ordering column only and cached until the listing changes.
+        """
+        cache_key = self.get_cache_key('boundaries')
+        boundaries = cache.get(cache_key)
+        if boundaries is None:
+            rows = self.object_list.values_list(self.order_field, 'pk')
+            boundaries = [
+                row for index, row in enumerate(rows.iterator())
+                if (index + 1) % self.per_page == 0
+            ]
+            cache.set(cache_key, boundaries, LISTING_CACHE_TIMEOUT)
+        return boundaries
+
+    def get_seek_filter(self, boundary):
+        value, pk = boundary
+        lookup = 'lt' if self.ordering.startswith('-') else 'gt'
+        return (
+            Q(**{f'{self.order_field}__{lookup}': value}) |
+            Q(**{self.order_field: value, f'pk__{lookup}': pk})
+        )
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.is_keyset or number == 1:
+            return super().page(number)
+
+        boundaries = self.get_boundaries()
+        if len(boundaries) < number - 1:
+            # boundaries computed before a concurrent change; offset is still correct
+            return super().page(number)
+
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        if top + self.orphans >= self.count:
+            top = self.count
+        object_list = self.object_list.filter(self.get_seek_filter(boundaries[number - 2]))
+        return self._get_page(object_list[:top - bottom], number, self)
+
+    def get_page_window(self, number, window=PAGE_RANGE_WINDOW):
+        """
+        Return the page numbers to display (up to window pages both ways) including the first/last pages
+        if they are not already in range.
+        """
+        page_index_start = max(0, number - 1 - window)
+        page_index_end = min(self.num_pages, page_index_start + 2 * window + 1)
+
+        page_range = []
+        if page_index_start > 0:
+            page_range.append(1)
+        page_range += range(page_index_start + 1, page_index_end + 1)
+        if page_index_end < self.num_pages:
+            page_range.append(self.num_pages)
+        return page_range
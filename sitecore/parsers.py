@@ -1,18 +1,125 @@
 """
 Sitecore parser module for implementing embedded shortcodes in user entered rich text fields and blocks, and
-the handling of markdown and shortcodes combined for markdown text fields and blocks.
+the handling of markdown and shortcodes combined for markdown text fields and blocks. The parsed HTML is
+stored in the ParsedText table keyed by a hash of the source text, so content validated on Save Draft/Publish
+is only parsed once and page renders emit the stored output. Rows of text no longer in the current content
+(or revisions) are deleted by the prune_parsed_text command.
 :Authors: Louise Lever <louise.lever@manchester.ac.uk>
 :Copyright: Research IT, IT Services, The University of Manchester
 """
+import functools
+import hashlib
+import json
+import os
+import threading
+
 import markdown  # TODO replace with custom version for Bootstrap3 formatted output
 import shortcodes
 import sitecore.config as sitecore_config
 
+from django.conf import settings
 from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError
 
-from wagtail.blocks.stream_block import StreamBlockValidationError
+from wagtail.blocks.stream_block import StreamBlockValidationError, StreamValue
+
+
+# bump to re-parse all stored content e.g., after changing the registered shortcode handlers
+PARSER_VERSION = getattr(settings, 'SITECORE_PARSER_VERSION', 1)
+# number of recently parsed texts held in memory (per process) in front of the ParsedText table
+PARSED_TEXT_CACHE_SIZE = getattr(settings, 'SITECORE_PARSED_TEXT_CACHE_SIZE', 256)
+
+PARSER_NAMES = ('shortcodes', 'markdown_shortcodes')
+
+# markdown.Markdown instances are not thread safe but can be reset and reused, so keep one per thread
+_markdown = threading.local()
+
+
+def get_markdown_parser():
+    if not hasattr(_markdown, 'parser'):
+        _markdown.parser = markdown.Markdown(extensions=['markdown.extensions.tables','markdown.extensions.footnotes'])
+    return _markdown.parser.reset()
+
+
+def get_parsed_text_digest(parser_name, value):
+    key = f'{parser_name}|{PARSER_VERSION}|{sitecore_config.START}|{sitecore_config.END}|{sitecore_config.ESC}'
+    return hashlib.sha256(f'{key}|{value}'.encode('utf-8')).hexdigest()
+
+
+@functools.lru_cache(maxsize=PARSED_TEXT_CACHE_SIZE)
+def get_parsed_text(parser_name, parse, value):
+    """
+    Return the HTML for value from the ParsedText table, running the parse function and storing its output
+    on a miss. Only successful parses are stored (and memoized), so invalid content always raises the
+    ValidationError from the parser.
+    """
+    from sitecore.models import ParsedText
+
+    digest = get_parsed_text_digest(parser_name, value)
+    html = ParsedText.objects.filter(digest=digest).values_list('html', flat=True).first()
+    if html is None:
+        html = str(parse(value))
+        ParsedText.objects.bulk_create([ParsedText(digest=digest, html=html)], ignore_conflicts=True)
+    return html
+
+
+def iter_text(value):
+    """
+    Yield every string in a (JSON like) value, including those inside JSON encoded strings (e.g., the
+    StreamField content stored in revisions).
+    """
+    if isinstance(value, StreamValue):
+        value = value.get_prep_value()
+    if isinstance(value, str):
+        yield value
+        if value[:1] in ('[', '{'):
+            try:
+                decoded = json.loads(value)
+            except ValueError:
+                return
+            yield from iter_text(decoded)
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from iter_text(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from iter_text(item)
+
+
+def get_referenced_parsed_text_digests():
+    """
+    Return the ParsedText digests of the text the site can still render: every string in the text and
+    stream fields of the project's models (pages, snippets and settings) and in the latest and live
+    revisions of pages and snippets, as parsed by either parser.
+    """
+    from django.apps import apps
+    from django.db import models
+    from wagtail.fields import StreamField
+    from wagtail.models import Revision
+
+    texts = set()
+    revision_ids = set()
+    for app_config in apps.get_app_configs():
+        if not app_config.path.startswith(str(settings.BASE_DIR) + os.sep):
+            continue
+        for model in app_config.get_models():
+            fields = [
+                field.attname for field in model._meta.local_concrete_fields
+                if isinstance(field, (models.CharField, models.TextField, StreamField))
+            ]
+            if fields:
+                for row in model._base_manager.values_list(*fields).iterator():
+                    texts.update(iter_text(list(row)))
+            for name in ('latest_revision', 'live_revision'):
+                if any(field.name == name for field in model._meta.local_concrete_fields):
+                    revision_ids.update(
+                        model._base_manager.exclude(**{name: None}).values_list(f'{name}_id', flat=True)
+                    )
+
+    for content in Revision.objects.filter(pk__in=revision_ids).values_list('content', flat=True).iterator():
+        texts.update(iter_text(content))
+    return {get_parsed_text_digest(parser_name, text) for text in texts for parser_name in PARSER_NAMES}
 
 
 def ParseShortcodes(value):
@@ -22,7 +129,12 @@ def ParseShortcodes(value):
     provided content contains valid shortcodes. Invalid shortcodes will raise exceptions in the page render
     process and return a 500 page error. On page render, this parser is used to generate the output HTML,
     and has therefore already been validated.
+    The output is read from (or added to) the stored ParsedText, so on page render the content is not parsed.
     """
+    return mark_safe(get_parsed_text('shortcodes', _parse_shortcodes, str(value)))
+
+
+def _parse_shortcodes(value):
     parser = shortcodes.Parser(start=sitecore_config.START, end=sitecore_config.END, esc=sitecore_config.ESC)
     try:
         return mark_safe(parser.parse(mark_safe(value)))
@@ -53,11 +165,16 @@ def ParseMarkdownAndShortcodes(value):
     i.e., process any instances of [*] notation which would break Shortcode processing -- assuming [ and ] are
     used as delimiters.
     Note: There is no exception mechanism for the Markdown parse stage.
+    The output is read from (or added to) the stored ParsedText, so on page render the content is not parsed.
     """
-    md_parser = markdown.Markdown(extensions=['markdown.extensions.tables','markdown.extensions.footnotes'])
+    return mark_safe(get_parsed_text('markdown_shortcodes', _parse_markdown_and_shortcodes, str(value)))
+
+
+def _parse_markdown_and_shortcodes(value):
+    md_parser = get_markdown_parser()
     sc_parser = shortcodes.Parser(start=sitecore_config.START, end=sitecore_config.END, esc=sitecore_config.ESC)
 
-    md_text = md_parser.reset().convert(mark_safe(value))
+    md_text = md_parser.convert(mark_safe(value))
 
     try:
         return mark_safe(sc_parser.parse(mark_safe(md_text)))
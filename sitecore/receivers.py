@@ -0,0 +1,227 @@
+"""
+Sitecore receivers module for connecting Wagtail page signals to the sitecore caches (listings, menus and
+page responses), the materialized tag cloud summary, the static site export, the eager generation of
+image renditions and the image serve cache.
+:Copyright: Research IT, IT Services, The University of Manchester
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from wagtail.models import Page
+from wagtail.signals import page_published, page_unpublished, post_page_move
+
+from taggit.models import Tag
+
+from wagtailmenus.models import FlatMenu, FlatMenuItem, MainMenu, MainMenuItem
+
+from sitecore.blocks.embedded import CarouselSnippet, IconCardDeckSnippet
+from sitecore.blocks.text import TextSnippet
+from sitecore.cache import bump_page_cache_generation
+from sitecore.identity import call_after_request, get_or_load
+from sitecore.image_serve import remove_cached_images
+from sitecore.models import EmailSettings, SiteImage, SitePage, SitePageTags, SiteSettings, SiteTagSummary
+from sitecore.navigation import bump_menu_generation
+from sitecore.pagination import bump_listing_generation
+from sitecore.renditions import PREGENERATE_RENDITIONS, queue_generate_renditions, queue_job
+from sitecore.static_export import STATIC_EXPORT_ON_PUBLISH, STATIC_EXPORT_ROOT, run_static_export
+
+
+@receiver(post_page_move)
+def invalidate_listings_on_move(sender, **kwargs):
+    """
+    Moving/re-ordering a page changes 'path' ordered listings without changing their fingerprint.
+    """
+    bump_listing_generation()
+
+
+@receiver(page_published)
+@receiver(page_unpublished)
+@receiver(post_page_move)
+def invalidate_page_cache(sender, **kwargs):
+    transaction.on_commit(bump_page_cache_generation)
+
+
+@receiver(post_save, sender=CarouselSnippet)
+@receiver(post_save, sender=IconCardDeckSnippet)
+@receiver(post_save, sender=TextSnippet)
+@receiver(post_delete, sender=CarouselSnippet)
+@receiver(post_delete, sender=IconCardDeckSnippet)
+@receiver(post_delete, sender=TextSnippet)
+def invalidate_page_cache_on_edit(sender, **kwargs):
+    """
+    Snippets are referenced from stream blocks by id, so editing (or deleting) them must also refresh the
+    cached page responses, their validators and the block fragments that render them.
+    """
+    transaction.on_commit(bump_page_cache_generation)
+
+
+@receiver(post_save, sender=SiteImage)
+@receiver(post_delete, sender=SiteImage)
+def invalidate_page_cache_on_image_change(sender, instance, **kwargs):
+    """
+    As for snippets, for images edited or deleted. Saves that only update other fields (e.g., the file hash)
+    are skipped, as with the image serve cache (see remove_cached_images_on_change).
+    """
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not {'file', 'focal_point_x'} & set(update_fields):
+        return
+    transaction.on_commit(bump_page_cache_generation)
+
+
+@receiver(post_save, sender=SiteSettings)
+@receiver(post_save, sender=EmailSettings)
+@receiver(post_save, sender=MainMenu)
+@receiver(post_save, sender=FlatMenu)
+@receiver(post_save, sender=MainMenuItem)
+@receiver(post_save, sender=FlatMenuItem)
+@receiver(post_delete, sender=SiteSettings)
+@receiver(post_delete, sender=EmailSettings)
+@receiver(post_delete, sender=MainMenu)
+@receiver(post_delete, sender=FlatMenu)
+@receiver(post_delete, sender=MainMenuItem)
+@receiver(post_delete, sender=FlatMenuItem)
+def invalidate_page_cache_on_settings_edit(sender, **kwargs):
+    """
+    The site settings (theme, brand logo and navbar) and the wagtailmenus menus are rendered on every
+    page, so editing them must refresh every cached response and validator too.
+    """
+    transaction.on_commit(bump_page_cache_generation)
+
+
+@receiver(page_published)
+@receiver(page_unpublished)
+@receiver(post_page_move)
+def invalidate_menu_tree(sender, **kwargs):
+    transaction.on_commit(bump_menu_generation)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_menu_tree_on_page_change(sender, instance, **kwargs):
+    """
+    Catch menu changes made outside publishing i.e., deleting pages or saving show_in_menus directly. Page
+    saves by save_revision() (drafts) pass update_fields without show_in_menus so are ignored.
+    """
+    if not isinstance(instance, Page):
+        return
+    update_fields = kwargs.get('update_fields')
+    if update_fields is None or 'show_in_menus' in update_fields:
+        transaction.on_commit(bump_menu_generation)
+        transaction.on_commit(bump_page_cache_generation)
+
+
+def refresh_tag_summary(tag_ids):
+    """
+    Refresh the SiteTagSummary rows for the given tags once the current transaction commits.
+    """
+    tag_ids = set(tag_ids)
+    if tag_ids:
+        transaction.on_commit(lambda: SiteTagSummary.refresh(tag_ids))
+
+
+@receiver(page_published)
+@receiver(page_unpublished)
+def update_tag_summary(sender, instance, **kwargs):
+    # the signals are sent with the specific page class, so filter for SitePage derived pages here
+    if isinstance(instance, SitePage):
+        refresh_tag_summary(SitePageTags.objects.filter(content_object=instance).values_list('tag_id', flat=True))
+
+
+@receiver(post_save, sender=SitePageTags)
+@receiver(post_delete, sender=SitePageTags)
+def update_tag_summary_on_tagging(sender, instance, **kwargs):
+    refresh_tag_summary([instance.tag_id])
+
+
+@receiver(post_save, sender=Tag)
+def update_tag_summary_on_tag_edit(sender, instance, created, **kwargs):
+    if not created:
+        SiteTagSummary.objects.filter(tag=instance).update(slug=instance.slug, name=instance.name)
+
+
+def queue_static_export(*args):
+    """
+    Queue the static export update (see run_static_export) to the background worker pool after commit,
+    deferred to the end of the request so the receivers of other apps (e.g., the article archive counts)
+    have updated their on_commit state first.
+    """
+    if STATIC_EXPORT_ON_PUBLISH and STATIC_EXPORT_ROOT:
+        transaction.on_commit(lambda: call_after_request(lambda: queue_job(run_static_export, *args)))
+
+
+@receiver(page_published)
+def update_static_export_on_publish(sender, instance, **kwargs):
+    if isinstance(instance, SitePage):
+        queue_static_export(instance.pk)
+
+
+@receiver(page_unpublished)
+def update_static_export_on_unpublish(sender, instance, **kwargs):
+    if isinstance(instance, SitePage):
+        queue_static_export(instance.pk, True)
+
+
+@receiver(post_page_move)
+def update_static_export_on_move(sender, instance, parent_page_before, url_path_before, **kwargs):
+    queue_static_export(instance.pk, False, parent_page_before.pk, url_path_before)
+
+
+@receiver(post_save, sender=CarouselSnippet)
+@receiver(post_save, sender=IconCardDeckSnippet)
+@receiver(post_save, sender=TextSnippet)
+@receiver(post_save, sender=SiteSettings)
+@receiver(post_save, sender=MainMenu)
+@receiver(post_save, sender=FlatMenu)
+@receiver(post_save, sender=MainMenuItem)
+@receiver(post_save, sender=FlatMenuItem)
+@receiver(post_delete, sender=CarouselSnippet)
+@receiver(post_delete, sender=IconCardDeckSnippet)
+@receiver(post_delete, sender=TextSnippet)
+@receiver(post_delete, sender=SiteSettings)
+@receiver(post_delete, sender=MainMenu)
+@receiver(post_delete, sender=FlatMenu)
+@receiver(post_delete, sender=MainMenuItem)
+@receiver(post_delete, sender=FlatMenuItem)
+def update_static_export_on_edit(sender, **kwargs):
+    """
+    Snippets can be shown on any page and the settings (theme, brand) and menus on every page, so editing
+    them re-renders the whole export; queued once per request (a menu is saved along with its items).
+    """
+    get_or_load(('static_export', None), queue_static_export)
+
+
+@receiver(pre_save, sender=SiteImage)
+def reset_placeholder_on_file_change(sender, instance, **kwargs):
+    # a new placeholder is made for the new file along with its renditions (see generate_renditions_on_save)
+    if instance.pk and instance.placeholder:
+        if SiteImage.objects.filter(pk=instance.pk).exclude(file=instance.file.name).exists():
+            instance.placeholder = ''
+
+
+@receiver(post_save, sender=SiteImage)
+def generate_renditions_on_save(sender, instance, **kwargs):
+    """
+    Generate the renditions the site uses once a new or changed image is committed (in the worker pool, if
+    there is one; see queue_generate_renditions). Saves that only update other fields (e.g., the file hash
+    or title) are skipped.
+    """
+    update_fields = kwargs.get('update_fields')
+    if not PREGENERATE_RENDITIONS or (update_fields is not None and not {'file', 'focal_point_x'} & set(update_fields)):
+        return
+    image_id = instance.pk
+    transaction.on_commit(lambda: queue_generate_renditions(image_id))
+
+
+@receiver(post_save, sender=SiteImage)
+@receiver(post_delete, sender=SiteImage)
+def remove_cached_images_on_change(sender, instance, **kwargs):
+    """
+    Remove the image serve cache of a deleted image, or of an image whose file or focal point may have
+    changed (the served URLs stay the same, so the cached files must go).
+    """
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not {'file', 'focal_point_x'} & set(update_fields):
+        return
+    image_id = instance.pk
+    transaction.on_commit(lambda: remove_cached_images(image_id))
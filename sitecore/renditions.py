@@ -0,0 +1,398 @@
+"""
+Sitecore renditions module for implementing the eager generation of the renditions the site templates
+use, so the first visitor after an image upload (or publish) doesn't wait on Pillow resizing. The
+generate_renditions command makes them for new and existing images; run it with --missing from cron (or a
+systemd timer) as the single dedicated rendition worker, so only the images not yet processed are opened.
+With SITECORE_RENDITION_WORKERS set, renditions are instead generated in a pool of worker processes once the
+image has been saved, but every web worker process starts its own pool, so only set it where there are few
+web processes (e.g., a single admin instance). Also builds the width ladder/format alternative renditions
+used by the responsive_rendition tag and the low quality placeholder stored on each image, and works out which filter specs are still in use (for the
+prune_renditions command).
+
+Apps add the filter specs their templates and blocks use with the 'register_rendition_filter_specs'
+Wagtail hook, expanding those rendered with the responsive_rendition tag to their width ladders and
+formats, e.g., in <app>/wagtail_hooks.py:
+
+    @hooks.register('register_rendition_filter_specs')
+    def article_rendition_filter_specs():
+        return get_responsive_rendition_filter_specs(
+            [spec for spec, label in ArticlePage.ARTICLE_IMAGE_FILTERSPEC_CHOICES]
+        )
+
+:Copyright: Research IT, IT Services, The University of Manchester
+"""
+import atexit
+import base64
+import functools
+import logging
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+from django.conf import settings
+from django.template import engines
+from django.utils.safestring import mark_safe
+from django.utils.text import smart_split
+
+from wagtail import hooks
+
+
+logger = logging.getLogger(__name__)
+
+PREGENERATE_RENDITIONS = getattr(settings, 'SITECORE_PREGENERATE_RENDITIONS', True)
+# worker processes (per web process) for generating renditions after image uploads; with 0 (the default)
+# uploads leave them to the generate_renditions command and other background jobs run in the web process
+RENDITION_WORKERS = getattr(settings, 'SITECORE_RENDITION_WORKERS', 0)
+# extra filter specs to generate, on top of those registered with the hook
+RENDITION_FILTER_SPECS = getattr(settings, 'SITECORE_RENDITION_FILTER_SPECS', ())
+
+# default width ladder and the modern formats offered before the fallback (AVIF is smaller than WebP but
+# much slower to encode)
+RESPONSIVE_WIDTHS = getattr(settings, 'SITECORE_RESPONSIVE_WIDTHS', (480, 960, 1440, 1920))
+RESPONSIVE_FORMATS = getattr(settings, 'SITECORE_RESPONSIVE_FORMATS', ('webp',))
+RESPONSIVE_FALLBACK_FORMAT = getattr(settings, 'SITECORE_RESPONSIVE_FALLBACK_FORMAT', 'jpeg')
+
+FORMAT_MIME_TYPES = {
+    'avif': 'image/avif',
+    'gif': 'image/gif',
+    'jpeg': 'image/jpeg',
+    'png': 'image/png',
+    'webp': 'image/webp',
+}
+
+resize_spec_re = re.compile(r'^(fill|max|min)-(\d+)x(\d+)(-c\d+)?$')
+width_spec_re = re.compile(r'^width-(\d+)$')
+
+template_filter_spec_res = (
+    # {% rendition image 'fill-300x300' as photo %} and {% image image max-169x72 as photo %}
+    re.compile(r'{%\s*(?:rendition|responsive_rendition|image)\s+\S+\s+(["\']?)([^\s"\'%]+)\1'),
+    # {% include_block block with filterspec='width-1200' %}
+    re.compile(r'filterspec=(["\'])([^"\']+)\1'),
+)
+responsive_tag_re = re.compile(r'{%\s*responsive_rendition\s+(.*?)%}')
+
+# longest side (in pixels) of the placeholder images, shown blurred and scaled up while an image loads
+PLACEHOLDER_SIZE = getattr(settings, 'SITECORE_IMAGE_PLACEHOLDER_SIZE', 16)
+
+_executor = None
+_executor_lock = threading.Lock()
+# (function, args) of the jobs queued to the shared pool that have not finished
+_pending_jobs = {}
+
+
+@functools.lru_cache(maxsize=256)
+def get_filter(filter_spec):
+    """
+    Return the (shared) Filter for a filter spec string; Filter parses the spec into its operations once.
+    """
+    from wagtail.images.models import Filter
+
+    return Filter(spec=filter_spec)
+
+
+def get_rendition_filter_specs():
+    """
+    Return the (de-duplicated, ordered) filter specs registered with the 'register_rendition_filter_specs'
+    hook and the SITECORE_RENDITION_FILTER_SPECS setting.
+    """
+    filter_specs = []
+    for fn in hooks.get_hooks('register_rendition_filter_specs'):
+        filter_specs.extend(fn())
+    filter_specs.extend(RENDITION_FILTER_SPECS)
+    return list(dict.fromkeys(filter_specs))
+
+
+def get_placeholder(image):
+    """
+    Return a tiny WebP of the image (PLACEHOLDER_SIZE pixels on its longest side) as a data URI.
+    """
+    with image.get_willow_image() as willow:
+        willow = willow.auto_orient()
+        width, height = willow.get_size()
+        scale = PLACEHOLDER_SIZE / max(width, height)
+        willow = willow.resize((max(1, round(width * scale)), max(1, round(height * scale))))
+        output = BytesIO()
+        willow.save_as_webp(output, quality=40)
+    return 'data:image/webp;base64,' + base64.b64encode(output.getvalue()).decode('ascii')
+
+
+def generate_renditions(image_id, filter_specs=None):
+    """
+    Create any missing renditions of an image for the filter specs (default: all registered specs), and its
+    placeholder if it has none; returns the number of renditions checked. Renditions that already exist are
+    only looked up.
+    """
+    from wagtail.images import get_image_model
+    from wagtail.images.models import SourceImageIOError
+
+    filter_specs = filter_specs or get_rendition_filter_specs()
+    image = get_image_model().objects.filter(pk=image_id).first()
+    if image is None:
+        return 0
+    try:
+        if hasattr(image, 'placeholder') and not image.placeholder and not image.is_svg():
+            # update (rather than save) so the post_save receivers don't queue the image again
+            type(image).objects.filter(pk=image.pk).update(placeholder=get_placeholder(image))
+        return len(image.get_renditions(*filter_specs)) if filter_specs else 0
+    except SourceImageIOError:
+        logger.warning('Could not generate renditions of image %s: source file not found', image_id)
+        return 0
+
+
+def init_worker():
+    # worker processes are spawned (not forked, so they share no database connections with the parent)
+    import django
+    django.setup()
+
+
+def get_executor(max_workers=None):
+    """
+    Return a new pool of rendition worker processes when max_workers is given, otherwise the shared pool
+    used for image uploads and static export updates (started on first use). The shared pool is shut down
+    without waiting when the process exits (e.g., a web worker restart), and the queued jobs it drops are
+    logged (see finish_job).
+    """
+    global _executor
+
+    context = multiprocessing.get_context('spawn')
+    if max_workers is not None:
+        return ProcessPoolExecutor(max_workers=max_workers, mp_context=context, initializer=init_worker)
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=RENDITION_WORKERS, mp_context=context, initializer=init_worker)
+            # concurrent.futures waits for every queued job from its own threading exit hook, which runs
+            # before atexit ones, so cancel them from an earlier hook (hooks run last registered first)
+            register_exit = getattr(threading, '_register_atexit', atexit.register)
+            register_exit(_executor.shutdown, wait=False, cancel_futures=True)
+        return _executor
+
+
+def finish_job(future):
+    func, args = _pending_jobs.pop(future, (None, ()))
+    if future.cancelled():
+        # queued jobs are dropped when the web process exits (see get_executor); for renditions, re-run
+        # the generate_renditions command with --missing
+        logger.warning('Background job %s%r was cancelled at shutdown', getattr(func, '__name__', func), args)
+    elif future.exception() is not None:
+        logger.error('Background job %s%r failed', getattr(func, '__name__', func), args, exc_info=future.exception())
+
+
+def queue_job(func, *args):
+    """
+    Run func(*args) in the background worker pool (or immediately, without workers). func must be a module
+    level function (so it can be sent to the worker processes) taking picklable arguments, e.g., ids.
+    """
+    global _executor
+
+    if not RENDITION_WORKERS:
+        func(*args)
+        return
+    try:
+        future = get_executor().submit(func, *args)
+    except BrokenProcessPool:
+        # a worker died (e.g., killed for running out of memory); start a new pool
+        with _executor_lock:
+            _executor = None
+        future = get_executor().submit(func, *args)
+    _pending_jobs[future] = (func, args)
+    future.add_done_callback(finish_job)
+
+
+def queue_generate_renditions(image_id):
+    """
+    Generate the renditions of an image in the background worker pool. Without workers nothing is done
+    here; the image is left without a placeholder, so 'generate_renditions --missing' picks it up.
+    """
+    if RENDITION_WORKERS:
+        queue_job(generate_renditions, image_id)
+
+
+def get_width_filter_spec(filter_spec, width):
+    """
+    Return the filter spec scaled down to width, keeping its aspect ratio, crop closeness and any other
+    filters (e.g., fill-1200x300|jpegquality-60 to fill-480x120|jpegquality-60). Returns None for specs
+    that can't be scaled (e.g., height-200) or are no wider than width.
+    """
+    operation, *options = filter_spec.split('|')
+    match = resize_spec_re.match(operation)
+    if match:
+        method, spec_width, spec_height, closeness = match.groups()
+        if width >= int(spec_width):
+            return None
+        height = max(1, round(int(spec_height) * width / int(spec_width)))
+        operation = f'{method}-{width}x{height}{closeness or ""}'
+    elif operation == 'original' or width_spec_re.match(operation):
+        if operation != 'original' and width >= int(width_spec_re.match(operation).group(1)):
+            return None
+        operation = f'width-{width}'
+    else:
+        return None
+    return '|'.join([operation, *options])
+
+
+class ResponsiveRendition:
+    """
+    The renditions of an image for a width ladder, in each modern format and the fallback format.
+    sources holds the <source> type/srcset of each modern format, and fallback the widest fallback format
+    rendition (for the <img> src, width and height). steps holds, for each width, the fallback URL and
+    a CSS image-set() of every format, plus the viewport min-width it applies from (for CSS backgrounds).
+    """
+
+    def __init__(self, renditions_by_format):
+        self.renditions_by_format = renditions_by_format
+        *modern, (fallback_format, fallback_renditions) = renditions_by_format
+        self.fallback = fallback_renditions[-1]
+        self.srcset = self.get_srcset(fallback_renditions)
+        self.sources = [
+            {'type': FORMAT_MIME_TYPES.get(format, f'image/{format}'), 'srcset': self.get_srcset(renditions)}
+            for format, renditions in modern
+        ]
+
+    @staticmethod
+    def get_srcset(renditions):
+        return ', '.join(f'{rendition.url} {rendition.width}w' for rendition in renditions)
+
+    @property
+    def steps(self):
+        steps = []
+        min_width = 0
+        for index, rendition in enumerate(self.renditions_by_format[-1][1]):
+            image_set = ', '.join(
+                f'url("{renditions[min(index, len(renditions) - 1)].url}") type("{FORMAT_MIME_TYPES.get(format, f"image/{format}")}")'
+                for format, renditions in self.renditions_by_format
+                if format
+            )
+            steps.append({
+                'width': rendition.width,
+                'min_width': min_width,
+                'url': rendition.url,
+                'image_set': mark_safe(f'image-set({image_set})') if image_set else '',
+            })
+            min_width = rendition.width
+        return steps
+
+
+def get_responsive_filter_specs(filter_spec, widths=None):
+    """
+    Return the (format, filter specs) pairs of a responsive rendition: the filter spec and its width ladder
+    (narrowest first) in each modern format and then the fallback format. Specs that already choose a
+    format get no format alternatives.
+    """
+    widths = sorted(widths or RESPONSIVE_WIDTHS)
+    ladder = [spec for spec in (get_width_filter_spec(filter_spec, width) for width in widths) if spec]
+    ladder.append(filter_spec)
+    if 'format-' in filter_spec:
+        return [(None, ladder)]
+    return [
+        (format, [f'{spec}|format-{format}' for spec in ladder])
+        for format in [*RESPONSIVE_FORMATS, RESPONSIVE_FALLBACK_FORMAT]
+    ]
+
+
+def get_responsive_rendition_filter_specs(filter_specs, widths=None):
+    """
+    Return every filter spec the responsive_rendition tag renders for the filter specs (with the widths
+    given to the tag), for registering with the 'register_rendition_filter_specs' hook.
+    """
+    return [
+        spec
+        for filter_spec in filter_specs
+        for format, specs in get_responsive_filter_specs(filter_spec, widths)
+        for spec in specs
+    ]
+
+
+def get_responsive_rendition(image, filter_spec, widths=None):
+    """
+    Fetch (creating any missing) the renditions of an image for every filter spec of a responsive rendition
+    in a single batch, returning a ResponsiveRendition. Renditions of the same width (Wagtail never
+    upscales) are dropped. With SITECORE_IMAGE_SERVE_DYNAMIC on, DynamicRenditions are used instead.
+    """
+    from wagtail.images.models import SourceImageIOError
+    from wagtail.images.shortcuts import get_rendition_or_not_found
+
+    from sitecore.image_serve import IMAGE_SERVE_DYNAMIC, DynamicRendition
+
+    filter_specs_by_format = get_responsive_filter_specs(filter_spec, widths)
+    all_specs = [spec for format, specs in filter_specs_by_format for spec in specs]
+    if IMAGE_SERVE_DYNAMIC:
+        renditions = {spec: DynamicRendition(image, spec) for spec in all_specs}
+    else:
+        try:
+            renditions = image.get_renditions(*all_specs)
+        except SourceImageIOError:
+            return ResponsiveRendition([(None, [get_rendition_or_not_found(image, filter_spec)])])
+
+    renditions_by_format = []
+    for format, specs in filter_specs_by_format:
+        format_renditions = []
+        for spec in specs:
+            rendition = renditions[spec]
+            if not format_renditions or rendition.width > format_renditions[-1].width:
+                format_renditions.append(rendition)
+        renditions_by_format.append((format, format_renditions))
+    return ResponsiveRendition(renditions_by_format)
+
+
+def is_valid_filter_spec(filter_spec):
+    from wagtail.images.exceptions import InvalidFilterSpecError
+
+    try:
+        return bool(get_filter(filter_spec).operations)
+    except InvalidFilterSpecError:
+        return False
+
+
+def get_template_sources():
+    for engine in engines.all():
+        for directory in getattr(engine, 'template_dirs', ()):
+            for root, dirs, files in os.walk(directory):
+                for name in files:
+                    if name.endswith('.html'):
+                        with open(os.path.join(root, name), encoding='utf-8') as f:
+                            yield f.read()
+
+
+def get_reachable_filter_specs():
+    """
+    Return the set of filter specs the site can still render: the registered specs (choice lists and
+    StreamField block styles), the literal specs in the templates (e.g., {% rendition image 'fill-300x300' %}
+    and filterspec='width-1200' passed to blocks), and the responsive renditions (width ladders and formats)
+    of each responsive_rendition tag. Tags given a variable filter spec are assumed to use any registered
+    spec. Variable specs elsewhere must come from the registered choices.
+
+    Reachability is per filter spec, not per (image, filter spec) pair: an image keeps the renditions of
+    every reachable spec even if it is never shown with that spec (e.g., a gallery style for an image that
+    is in no gallery). Working out the pairs would mean resolving every image reference in every StreamField
+    and revision, and those renditions are also the ones eagerly generated on upload, so pruning them would
+    only see them generated again.
+    """
+    registered_specs = get_rendition_filter_specs()
+    filter_specs = set(registered_specs)
+    for source in get_template_sources():
+        for regex in template_filter_spec_res:
+            for quote, filter_spec in regex.findall(source):
+                if is_valid_filter_spec(filter_spec):
+                    filter_specs.add(filter_spec)
+
+        for tag in responsive_tag_re.findall(source):
+            bits = list(smart_split(tag))
+            if len(bits) < 2:
+                continue
+            widths = None
+            for bit in bits[2:]:
+                if bit.startswith('widths='):
+                    try:
+                        widths = [int(width) for width in bit[7:].strip('"\'').replace(',', ' ').split()]
+                    except ValueError:
+                        pass  # a variable; assume the default widths
+            filter_spec = bits[1].strip('"\'')
+            base_specs = [filter_spec] if bits[1][0] in '"\'' and is_valid_filter_spec(filter_spec) else registered_specs
+            for base_spec in base_specs:
+                for format, specs in get_responsive_filter_specs(base_spec, widths):
+                    filter_specs.update(specs)
+    return filter_specs
@@ -0,0 +1,59 @@
+/*
+ * Load the rest of a gallery (see GalleryBlock) page by page: each "Show more images" link is replaced by
+ * the fragment it points to, fetched when it nears the viewport (or is clicked), which ends with the link
+ * to the next page.
+ */
+(function () {
+  'use strict';
+
+  var observer = null;
+
+  function load(next) {
+    var link = next.querySelector('a');
+    if (!link || next.dataset.loading) {
+      return;
+    }
+    next.dataset.loading = 'true';
+    fetch(link.href, {credentials: 'same-origin'})
+      .then(function (response) {
+        return response.ok ? response.text() : Promise.reject(response);
+      })
+      .then(function (html) {
+        var range = document.createRange();
+        range.selectNode(next);
+        var fragment = range.createContextualFragment(html);
+        var more = fragment.querySelector('[data-gallery-next]');
+        next.replaceWith(fragment);
+        if (more) {
+          watch(more);
+        }
+      })
+      .catch(function () {
+        // leave the link to be clicked (or followed) instead
+        delete next.dataset.loading;
+      });
+  }
+
+  function watch(next) {
+    next.querySelector('a').addEventListener('click', function (event) {
+      event.preventDefault();
+      load(next);
+    });
+    if (observer) {
+      observer.observe(next);
+    }
+  }
+
+  if ('IntersectionObserver' in window) {
+    observer = new IntersectionObserver(function (entries) {
+      entries.forEach(function (entry) {
+        if (entry.isIntersecting) {
+          observer.unobserve(entry.target);
+          load(entry.target);
+        }
+      });
+    }, {rootMargin: '600px 0px'});
+  }
+
+  document.querySelectorAll('[data-gallery-next]').forEach(watch);
+})();
@@ -0,0 +1,292 @@
+"""
+Sitecore static export module for rendering the live SitePage pages (with their listing pagination and
+RoutablePageMixin listing routes) to static HTML files, and for re-rendering only the pages affected by a
+publish, so a front end server can serve most anonymous traffic from disk.
+
+Files are written under SITECORE_STATIC_EXPORT_ROOT/<site hostname>/<page path>/ as index.html (the page
+or first listing page) and page-<n>.html (listing ?page=<n>). Only requests without a query string, or
+with just page=<n>, may be answered from the export; any other query (e.g., the ArticleIndexByDatePage
+filter form) must reach Django. e.g., for nginx:
+
+    map $args $static_export_file {
+        default             "";
+        ""                  index.html;
+        "~^page=1$"         index.html;
+        "~^page=([0-9]+)$"  page-$1.html;
+    }
+    location / {
+        root /path/to/static-export;
+        error_page 418 = @django;
+        if ($static_export_file = "") {
+            return 418;
+        }
+        try_files /$host$uri$static_export_file @django;
+    }
+
+The .gz/.br variants of each file are written alongside it (see sitecore/storage.py) for gzip_static.
+Pages excluded from the page response cache (e.g., search) or with view restrictions are not exported, so
+Django still serves those, the admin and the dynamic routes (calendars, iCalendar feeds).
+:Copyright: Research IT, IT Services, The University of Manchester
+"""
+import logging
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from urllib.parse import parse_qs, urlsplit
+
+from django.conf import settings
+from django.core.handlers.base import BaseHandler
+from django.core.handlers.wsgi import WSGIRequest
+
+from wagtail import hooks
+from wagtail.models import Site
+
+from sitecore.cache import STATIC_EXPORT_ENVIRON_KEY, is_cacheable_response
+from sitecore.storage import compress_file
+
+
+logger = logging.getLogger(__name__)
+
+STATIC_EXPORT_ROOT = getattr(settings, 'SITECORE_STATIC_EXPORT_ROOT', None)
+# re-render the affected pages on publish/unpublish/move (needs SITECORE_STATIC_EXPORT_ROOT)
+STATIC_EXPORT_ON_PUBLISH = getattr(settings, 'SITECORE_STATIC_EXPORT_ON_PUBLISH', False)
+
+
+class StaticExporter:
+    """
+    Renders pages through the full middleware and URL routing stack (as an anonymous GET request for the
+    page's site) and writes the 200 responses to the export root.
+    """
+
+    def __init__(self, root=None):
+        self.root = root or STATIC_EXPORT_ROOT
+        self.handler = BaseHandler()
+        self.handler.load_middleware()
+        self.sites = {site.pk: site for site in Site.objects.all()}
+
+    def get_request(self, site, path):
+        url = urlsplit(path)
+        scheme = 'https' if site.port == 443 else 'http'
+        host = site.hostname if site.port in (80, 443) else f'{site.hostname}:{site.port}'
+        return WSGIRequest({
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': url.path,
+            'QUERY_STRING': url.query,
+            'SERVER_NAME': site.hostname,
+            'SERVER_PORT': str(site.port),
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': host,
+            'wsgi.input': BytesIO(),
+            'wsgi.url_scheme': scheme,
+            STATIC_EXPORT_ENVIRON_KEY: True,
+        })
+
+    def get_file_path(self, site, path):
+        url = urlsplit(path)
+        number = parse_qs(url.query).get('page', ['1'])[0]
+        filename = 'index.html' if number == '1' else f'page-{number}.html'
+        return os.path.join(self.root, site.hostname, url.path.strip('/'), filename)
+
+    def write_file(self, file_path, content):
+        # write to a temporary file and rename, so the front end server never reads a partial file
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(file_path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, file_path)
+        self.remove_compressed_files(file_path)
+        compress_file(file_path)
+
+    def remove_compressed_files(self, file_path):
+        for extension in ('.gz', '.br'):
+            if os.path.exists(file_path + extension):
+                os.remove(file_path + extension)
+
+    def export_path(self, site, path):
+        """
+        Render one path of a site, writing the file for a 200 response (or removing any stale file).
+        """
+        response = self.handler.get_response(self.get_request(site, path))
+        file_path = self.get_file_path(site, path)
+        if is_cacheable_response(response):
+            self.write_file(file_path, response.content)
+            return True
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        self.remove_compressed_files(file_path)
+        return False
+
+    def get_page_site_path(self, page):
+        url_parts = page.get_url_parts()
+        if url_parts is None:
+            return None, None
+        site_id, root_url, page_path = url_parts
+        return self.sites.get(site_id), page_path
+
+    def export_page(self, page, paths=None):
+        """
+        Render the static export paths (default: all) of a (specific) page, removing the further listing
+        pages (page-<n>.html) beyond those of a listing that has shrunk; returns the number of files written.
+        """
+        if not getattr(page, 'cache_page_response', False) or page.get_view_restrictions().exists():
+            return 0
+        site, page_path = self.get_page_site_path(page)
+        if site is None:
+            return 0
+        paths = page.get_static_export_paths() if paths is None else paths
+        count = sum(self.export_path(site, page_path + path) for path in paths)
+        self.remove_stale_listing_pages(site, [page_path + path for path in paths])
+        return count
+
+    def remove_stale_listing_pages(self, site, paths):
+        filenames_by_directory = {}
+        for path in paths:
+            file_path = self.get_file_path(site, path)
+            filenames_by_directory.setdefault(os.path.dirname(file_path), set()).add(os.path.basename(file_path))
+        for directory, filenames in filenames_by_directory.items():
+            if not os.path.isdir(directory):
+                continue
+            for filename in os.listdir(directory):
+                # page-3.html, page-3.html.gz and page-3.html.br all belong to page-3.html
+                html_filename = filename.split('.html')[0] + '.html'
+                if filename.startswith('page-') and html_filename not in filenames:
+                    os.remove(os.path.join(directory, filename))
+
+    def export_pages(self, pages):
+        return sum(self.export_page(page) for page in pages)
+
+    def remove_page(self, page):
+        """
+        Remove the files of a single page (not those of any descendant pages in sub-directories).
+        """
+        site, page_path = self.get_page_site_path(page)
+        if site is None:
+            return
+        directory = os.path.dirname(self.get_file_path(site, page_path))
+        if os.path.isdir(directory):
+            for filename in os.listdir(directory):
+                if filename.startswith(('index.', 'page-')) and filename.endswith(('.html', '.html.gz', '.html.br')):
+                    os.remove(os.path.join(directory, filename))
+
+    def remove_url_path(self, url_path):
+        """
+        Remove the whole directory tree exported for a (previous) page url_path, e.g., after a move.
+        """
+        for site_id, root_path, root_url, language_code in Site.get_site_root_paths():
+            site = self.sites.get(site_id)
+            if site is not None and url_path.startswith(root_path):
+                directory = os.path.join(self.root, site.hostname, url_path[len(root_path):].strip('/'))
+                if url_path != root_path and os.path.isdir(directory):
+                    shutil.rmtree(directory)
+
+    def export_site(self, site=None):
+        """
+        Render every live, public SitePage (of one site, or all sites); returns the number of files written.
+        """
+        from sitecore.models import SitePage
+
+        pages = SitePage.objects.live().public().specific()
+        if site is not None:
+            pages = pages.in_site(site)
+        return self.export_pages(pages.iterator())
+
+
+def is_in_menu(page):
+    """
+    True if the page is (or was) shown in the navbar of its site, so every page must be re-rendered.
+    """
+    site = page.get_site()
+    return bool(site) and page.show_in_menus and page.depth <= site.root_page.depth + 2
+
+
+def get_listing_pages(parent):
+    """
+    Return the live pages whose output lists or links the children of parent: parent and its ancestors
+    (the site root and the index pages) and the pages apps add with the 'register_static_export_listing_pages'
+    Wagtail hook (e.g., event index pages listing the events under another page).
+    """
+    from sitecore.models import SitePage
+
+    pages = list(SitePage.objects.ancestor_of(parent, inclusive=True).live().specific())
+    for fn in hooks.get_hooks('register_static_export_listing_pages'):
+        pages.extend(fn(parent))
+    return pages
+
+
+def get_tag_slugs(pages):
+    """
+    Return the slugs of the tags of the pages, plus those of the previous revision of each page (tags
+    removed by the change being exported).
+    """
+    from sitecore.models import SitePageTags
+
+    slugs = set(SitePageTags.objects.filter(
+        content_object_id__in=[page.pk for page in pages]
+    ).values_list('tag__slug', flat=True))
+    for page in pages:
+        previous = page.revisions.order_by('-created_at', '-id')[1:2].first()
+        tags = getattr(previous.as_object(), 'tags', None) if previous is not None else None
+        if tags is not None:
+            slugs.update(tag.slug for tag in tags.all())
+    return slugs
+
+
+def update_static_export(page, unpublished=False, parent_page_before=None, url_path_before=None):
+    """
+    Re-render the static export for a published, unpublished or moved page: the page itself (and its
+    descendants after a move, as their URLs change), the pages listing it and the tag index routes of its
+    tags. Changes to pages shown in the navbar re-render the whole export, as every page includes the navbar.
+    """
+    from sitecore.models import SitePage, SiteTagIndexPage
+
+    exporter = StaticExporter()
+    if url_path_before:
+        exporter.remove_url_path(url_path_before)
+    elif unpublished:
+        exporter.remove_page(page)
+
+    if is_in_menu(page):
+        exporter.export_site()
+        return
+
+    if url_path_before:
+        changed_pages = list(SitePage.objects.descendant_of(page, inclusive=True).live().public().specific())
+        exporter.export_pages(changed_pages)
+    else:
+        changed_pages = [page]
+        if not unpublished:
+            exporter.export_page(page)
+    pages = get_listing_pages(page.get_parent())
+    if parent_page_before is not None:
+        pages += get_listing_pages(parent_page_before)
+    exporter.export_pages({affected.pk: affected for affected in pages}.values())
+
+    tag_slugs = get_tag_slugs(changed_pages)
+    if tag_slugs:
+        for tag_index_page in SiteTagIndexPage.objects.live():
+            exporter.export_page(tag_index_page, tag_index_page.get_static_export_paths(tag_slugs=tag_slugs))
+
+
+def run_static_export(page_id=None, unpublished=False, parent_page_before_id=None, url_path_before=None):
+    """
+    Background job (see sitecore.renditions.queue_job) updating the static export for a page (by id, as for
+    update_static_export), or re-rendering the whole export without one. Errors are logged rather than
+    raised, so a failed export never fails the publish that queued it.
+    """
+    from wagtail.models import Page
+
+    try:
+        if page_id is None:
+            StaticExporter().export_site()
+            return
+        page = Page.objects.filter(pk=page_id).first()
+        if page is None:
+            return
+        parent_page_before = Page.objects.filter(pk=parent_page_before_id).first() if parent_page_before_id else None
+        update_static_export(
+            page.specific, unpublished=unpublished, parent_page_before=parent_page_before, url_path_before=url_path_before
+        )
+    except Exception:
+        logger.exception('Static export update for page %s failed', page_id)
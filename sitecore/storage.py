@@ -0,0 +1,86 @@
+"""
+Sitecore storage module for implementing the static files storage that, on top of the hashed file names
+and manifest of ManifestStaticFilesStorage, writes precompressed .gz (and, with the optional Brotli package
+installed, .br) variants of the text assets during collectstatic. The front end server then serves the
+variant the client accepts without compressing on every request, e.g., for nginx:
+
+    location /static/ {
+        gzip_static on;
+        brotli_static on;  # with the ngx_brotli module
+    }
+
+:Copyright: Research IT, IT Services, The University of Manchester
+"""
+import gzip
+import os
+import tempfile
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# images (other than SVG) and web fonts are already compressed
+COMPRESS_STATIC_EXTENSIONS = tuple(getattr(settings, 'SITECORE_COMPRESS_STATIC_EXTENSIONS', (
+    '.css', '.js', '.map', '.json', '.svg', '.txt', '.xml', '.html', '.ico', '.eot', '.otf', '.ttf',
+)))
+# smaller files gain nothing once the response headers are counted
+COMPRESS_STATIC_MIN_SIZE = getattr(settings, 'SITECORE_COMPRESS_STATIC_MIN_SIZE', 256)
+
+
+def write_compressed_file(path, content):
+    # write to a temporary file and rename, so the front end server never reads a partial file
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(content)
+    os.chmod(temp_path, 0o644)
+    os.replace(temp_path, path)
+
+
+def compress_file(path):
+    """
+    Write the .gz/.br variants of a file, unless the compressed content is no smaller than the original.
+    gzip is written without a timestamp, so the variants only change when the content does. Variants
+    left from an earlier version of the file are removed when none is written now, so they are never
+    served in place of the new content.
+    """
+    with open(path, 'rb') as f:
+        content = f.read()
+
+    variants = {'.gz': None, '.br': None}
+    if len(content) >= COMPRESS_STATIC_MIN_SIZE:
+        variants['.gz'] = gzip.compress(content, compresslevel=9, mtime=0)
+        if brotli is not None:
+            variants['.br'] = brotli.compress(content)
+    for extension, compressed in variants.items():
+        if compressed is not None and len(compressed) < len(content):
+            write_compressed_file(path + extension, compressed)
+        elif os.path.exists(path + extension):
+            os.remove(path + extension)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage that also writes the compressed variants of both the original and hashed
+    copy of each text asset. Compression runs once every post processing pass has finished, as the hashed
+    CSS files are rewritten (with the hashed names of the files they reference) on each pass.
+    """
+
+    def post_process(self, *args, **kwargs):
+        names = set()
+        for name, hashed_name, processed in super().post_process(*args, **kwargs):
+            if not isinstance(processed, Exception):
+                names.add(name)
+                if hashed_name:
+                    names.add(hashed_name)
+            yield name, hashed_name, processed
+
+        if kwargs.get('dry_run'):
+            return
+        for name in sorted(names):
+            if name.lower().endswith(COMPRESS_STATIC_EXTENSIONS) and self.exists(name):
+                compress_file(self.path(name))
@@ -2,13 +2,19 @@ import re
 
 from django import template
 from django.core.exceptions import ImproperlyConfigured
+from django.forms.utils import flatatt
 from django.urls import NoReverseMatch
 from django.utils.functional import cached_property
+from django.utils.html import format_html, format_html_join
 
 from wagtail.images.models import Filter
 from wagtail.images.shortcuts import get_rendition_or_not_found
 from wagtail.images.views.serve import generate_image_url
 
+from sitecore.identity import get_or_load
+from sitecore.image_serve import IMAGE_SERVE_DYNAMIC, DynamicRendition
+from sitecore.renditions import get_filter, get_responsive_rendition
+
 
 register = template.Library()
 allowed_filter_pattern = re.compile(r"^[A-Za-z0-9_\-\.]+$")
@@ -106,6 +112,19 @@ def rendition(parser, token):
         )
 
 
+def get_request_rendition(image, filter_spec):
+    """
+    Return the rendition of image for filter_spec, loaded once per request through the identity map. With
+    SITECORE_IMAGE_SERVE_DYNAMIC on, a DynamicRendition (served by the image serve view) is returned instead.
+    """
+    if IMAGE_SERVE_DYNAMIC:
+        return DynamicRendition(image, filter_spec)
+    return get_or_load(
+        ('rendition', image.pk, filter_spec),
+        lambda: get_rendition_or_not_found(image, get_filter(filter_spec)),
+    )
+
+
 class RenditionNode(template.Node):
     '''
     Get the image and filter based on filter_spec_expr (variable containing filter_spec
@@ -116,19 +135,10 @@ class RenditionNode(template.Node):
         self.output_var_name = output_var_name
         self.attrs = attrs
         self.filter_specs_expr = filter_specs_expr
-        self.filter_spec = None
-
-    # LML: Can't used @cached_property as when filter_spec passed as a Variable rather than
-    # a string, it's not cached correctly. The last saved filter_spec gets "baked in"
-    # when a deployment server instance is restarted, so changes to a specific page'saved
-    # article_image_filterspec just doesn't work on Preview OR Publish.
 
-    # LML: Possible that "self.filter_spec = self.filter_specs_expr.resolve(context)" is not
-    # resolving to the string, but a step short. Need to investigate further.
-    
-    @property
-    def filter(self):
-        return Filter(spec=self.filter_spec)
+    # LML: The filter_spec is resolved on each render and kept local to it. Compiled templates (and so
+    # this node) are shared between requests and threads, so nothing resolved from the context may be
+    # stored on the node.
 
     def render(self, context):
         try:
@@ -143,19 +153,174 @@ class RenditionNode(template.Node):
             raise ValueError("image tag expected an Image object, got %r" % image)
 
         try:
-            self.filter_spec = self.filter_specs_expr.resolve(context)
+            filter_spec = self.filter_specs_expr.resolve(context)
         except template.VariableDoesNotExist:
             raise ValueError("rendition tag expected a Filter Object, got %r" % self.filter_specs_expr)
 
-        rendition = get_rendition_or_not_found(image, self.filter)
+        rendition = get_request_rendition(image, filter_spec)
 
         if self.output_var_name:
             # return the rendition object in the given variable
             context[self.output_var_name] = rendition
             return ''
         else:
-            # render the rendition's image tag now
-            resolved_attrs = {}
+            # render the rendition's image tag now (with its width and height), loaded lazily over its
+            # placeholder unless the attrs say otherwise
+            resolved_attrs = get_lazy_attrs(image)
             for key in self.attrs:
                 resolved_attrs[key] = self.attrs[key].resolve(context)
             return rendition.img_tag(resolved_attrs)
+
+
+@register.simple_tag
+def rendition_url(image, filter_spec):
+    '''
+    Return the signed URL of the image serve view for the image and filterspec e.g.,
+
+    <a href="{% rendition_url self.article_image 'max-1920x1920' %}">
+
+    The image is made on the first request for it, so the page render doesn't create a rendition.
+    '''
+    if not image:
+        return ''
+    return generate_image_url(image, filter_spec, viewname='sitecore_image_serve')
+
+
+@register.filter
+def placeholder_style(image):
+    '''
+    Return the inline style drawing the image's placeholder (see SiteImage.placeholder) as the background
+    of its <img> until the image has loaded e.g.,
+
+    <img src="{{ photo.url }}" width="{{ photo.width }}" height="{{ photo.height }}" loading="lazy" style="{{ image|placeholder_style }}">
+    '''
+    placeholder = getattr(image, 'placeholder', '')
+    return f'background: url({placeholder}) center / cover no-repeat;' if placeholder else ''
+
+
+def get_lazy_attrs(image):
+    attrs = {'loading': 'lazy', 'decoding': 'async'}
+    style = placeholder_style(image)
+    if style:
+        attrs['style'] = style
+    return attrs
+
+
+@register.tag(name="responsive_rendition")
+def responsive_rendition(parser, token):
+    '''
+    Responsive variant of the "rendition" templatetag, that renders a <picture> with a srcset of the
+    filterspec scaled to a width ladder, in the modern formats (WebP/AVIF, see SITECORE_RESPONSIVE_FORMATS)
+    and with a JPEG <img> fallback e.g.,
+
+    {% responsive_rendition self.article_image self.article_image_filterspec widths="480 960" sizes="100vw" class="img-fluid" %}
+
+    widths defaults to SITECORE_RESPONSIVE_WIDTHS, sizes to 100vw and alt to the image's alt text. The <img>
+    is loaded lazily over the image's placeholder (pass loading="eager" for images above the fold). Other
+    attr=value pairs are added to the <img>. Widths wider than the filterspec are not generated.
+
+    With "as name" the ResponsiveRendition is returned in the named variable instead e.g., for building
+    CSS backgrounds from its steps.
+    '''
+    bits = token.split_contents()[1:]
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(
+            "'responsive_rendition' tag should be of the form "
+            "{% responsive_rendition self.photo fill-1200x300 [ widths=\"480 960\" ] [ sizes=\"100vw\" ] [ custom-attr=\"value\" ... ] %} "
+            "or {% responsive_rendition self.photo fill-1200x300 [ widths=\"480 960\" ] as img %}"
+        )
+    image_expr = parser.compile_filter(bits[0])
+    filter_spec_expr = parser.compile_filter(bits[1])
+    bits = bits[2:]
+
+    output_var_name = None
+    if len(bits) >= 2 and bits[-2] == 'as':
+        output_var_name = bits[-1]
+        bits = bits[:-2]
+
+    attrs = {}
+    for bit in bits:
+        try:
+            name, value = bit.split('=', 1)
+        except ValueError:
+            raise template.TemplateSyntaxError(
+                "attr=value in 'responsive_rendition' tag badly formed (missing =). "
+                "(given argument: {})".format(bit)
+            )
+        attrs[name] = parser.compile_filter(value)
+
+    widths_expr = attrs.pop('widths', None)
+    sizes_expr = attrs.pop('sizes', None)
+    if output_var_name and (attrs or sizes_expr):
+        raise template.TemplateSyntaxError(
+            "attributes are not valid when using the 'as img' form of the 'responsive_rendition' tag"
+        )
+    return ResponsiveRenditionNode(image_expr, filter_spec_expr, widths_expr, sizes_expr, attrs, output_var_name)
+
+
+def parse_widths(widths):
+    if isinstance(widths, str):
+        widths = widths.replace(',', ' ').split()
+    return tuple(sorted({int(width) for width in widths}))
+
+
+def get_request_responsive_rendition(image, filter_spec, widths):
+    return get_or_load(
+        ('responsive_rendition', image.pk, filter_spec, widths),
+        lambda: get_responsive_rendition(image, filter_spec, widths),
+    )
+
+
+class ResponsiveRenditionNode(template.Node):
+    '''
+    Get the image, filter spec and widths (all resolved per render, as with RenditionNode) and render the
+    <picture> of the ResponsiveRendition, fetched once per request.
+    '''
+    def __init__(self, image_expr, filter_spec_expr, widths_expr=None, sizes_expr=None, attrs=None, output_var_name=None):
+        self.image_expr = image_expr
+        self.filter_spec_expr = filter_spec_expr
+        self.widths_expr = widths_expr
+        self.sizes_expr = sizes_expr
+        self.attrs = attrs or {}
+        self.output_var_name = output_var_name
+
+    def render(self, context):
+        try:
+            image = self.image_expr.resolve(context)
+        except template.VariableDoesNotExist:
+            return ''
+
+        if not image:
+            return ''
+
+        if not hasattr(image, 'get_rendition'):
+            raise ValueError("responsive_rendition tag expected an Image object, got %r" % image)
+
+        filter_spec = self.filter_spec_expr.resolve(context)
+        widths = parse_widths(self.widths_expr.resolve(context)) if self.widths_expr else None
+        responsive = get_request_responsive_rendition(image, filter_spec, widths)
+
+        if self.output_var_name:
+            context[self.output_var_name] = responsive
+            return ''
+
+        sizes = self.sizes_expr.resolve(context) if self.sizes_expr else '100vw'
+        img_attrs = {
+            'alt': getattr(image, 'alt_text', '') or responsive.fallback.alt,
+            'src': responsive.fallback.url,
+            'srcset': responsive.srcset,
+            'sizes': sizes,
+            'width': responsive.fallback.width,
+            'height': responsive.fallback.height,
+            **get_lazy_attrs(image),
+        }
+        for key in self.attrs:
+            img_attrs[key] = self.attrs[key].resolve(context)
+
+        return format_html(
+            '<picture>{}<img{}></picture>',
+            format_html_join('', '<source type="{}" srcset="{}" sizes="{}">', (
+                (source['type'], source['srcset'], sizes) for source in responsive.sources
+            )),
+            flatatt(img_attrs),
+        )
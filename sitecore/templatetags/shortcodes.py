@@ -1,6 +1,8 @@
 import shortcodes
 import html
 from django import template
+from django.utils.safestring import mark_safe
+from wagtail.rich_text import RichText, expand_db_html
 import sitecore.config as cfg
 import sitecore.parsers as parsers
 
@@ -86,5 +88,8 @@ register = template.Library()
 
 @register.simple_tag()
 def shortcodes(value):
+    # parse the rich text source (as validated and stored on save) then expand the links/embeds for output
+    if isinstance(value, RichText):
+        return mark_safe(expand_db_html(parsers.ParseShortcodes(value.source)))
     return parsers.ParseShortcodes(value)
 
@@ -1,46 +1,57 @@
 from datetime import date
 from django import template
-from wagtail.models import Page, Site
+
+from sitecore.cache import render_cached_block
+from sitecore.identity import get_page, get_page_url, get_site, get_slug_url
+from sitecore.navigation import get_menu_tree
 
 register = template.Library()
 
 
 @register.simple_tag(takes_context=True)
 def get_site_root(context):
-    
-    if 'request' in context and context['request'] is not None:
-        site = Site.find_for_request(context['request'])
-    else:
-        site = Site.objects.get(is_default_site=True)
-        
+    # the site and root page are loaded once per request (see sitecore/identity.py)
+    site = get_site(context.get('request'))
     return {
         'site': site,
         'root_page_id': site.root_page_id,
-        'root_page': Page.objects.get(pk=site.root_page_id)
+        'root_page': get_page(site.root_page_id)
     }
-    
 
-def has_menu_children(page):
-    return page.get_children().live().in_menu().exists()
+
+# pageurl/slugurl equivalents that resolve each page URL once per request
+@register.simple_tag(takes_context=True)
+def cached_pageurl(context, page):
+    return get_page_url(page, context.get('request'))
+
+
+@register.simple_tag(takes_context=True)
+def cached_slugurl(context, slug):
+    return get_slug_url(slug, context.get('request'))
 
 
 @register.inclusion_tag('sitecore/tags/top_menu.html', takes_context=True)
 def top_menu(context, parent, search_query='', transparent=False, calling_page=None):
     """
     Retrieves the top menu items - the immediate children of the root page.
-    The has_menu_children method is necessary because the bootstrap menu requires
-    a dropdown class to be applied to a parent.
+    The items (with their dropdown children) come from the cached menu tree (see sitecore/navigation.py),
+    which flags show_dropdown as the bootstrap menu requires a dropdown class to be applied to a parent.
     """
-    
-    menuitems = parent.get_children().live().in_menu().specific()
-    for menuitem in menuitems:
-        menuitem.show_dropdown = has_menu_children(menuitem)
-        # We don't directly check if calling_page is None since the template
-        # engine can pass an empty string to calling_page
-        # if the variable passed as calling_page does not exist.
-        menuitem.active = (calling_page.url.startswith(menuitem.url)
-                           if calling_page else False)
-        
+    request = context.get('request')
+    menu_tree = get_menu_tree(parent, request)
+
+    # We don't directly check if calling_page is None since the template
+    # engine can pass an empty string to calling_page
+    # if the variable passed as calling_page does not exist.
+    calling_path = getattr(calling_page, 'url_path', None) if calling_page else None
+    menuitems = [
+        dict(
+            menuitem,
+            show_dropdown=bool(menuitem['children']),
+            active=calling_path.startswith(menuitem['url_path']) if calling_path else False,
+        )
+        for menuitem in menu_tree['menuitems']
+    ]
 
     # build a the navbar configuration for this page
     site_settings = context['settings']['sitecore']['SiteSettings']
@@ -62,17 +73,21 @@ def top_menu(context, parent, search_query='', transparent=False, calling_page=N
         'calling_page': calling_page,
         'search_query': search_query,
         'menuitems': menuitems,
+        'search_url': menu_tree['search_url'],
         'navcfg': navcfg,
         'context': context,
         'path': context['request'].path if 'request' in context and context['request'] is not None else '/',
     }
 
 
-# Retrieves the children of the top menu items for the drop downs
+# Retrieves the children of the top menu items for the drop downs (from the menu tree item, or a page)
 @register.inclusion_tag('sitecore/tags/top_menu_children.html', takes_context=True)
 def top_menu_children(context, parent, menu_id):
-    menuitems_children = parent.get_children()
-    menuitems_children = menuitems_children.live().in_menu()
+    if isinstance(parent, dict):
+        menuitems_children = parent['children']
+    else:
+        menuitems_children = parent.get_children()
+        menuitems_children = menuitems_children.live().in_menu()
     return {
         'parent': parent,
         'menuitems_children': menuitems_children,
@@ -84,6 +99,7 @@ def top_menu_children(context, parent, menu_id):
 @register.inclusion_tag('sitecore/tags/taggit_list.html', takes_context=True)
 def taggit_list(context, page_tags, selected_tag=None, show_count=False):
    return {
+       'request': context.get('request'),
        'tags': page_tags,
        'selected': selected_tag,
        'show_count': show_count,
@@ -154,3 +170,8 @@ def page_content_type(context, page, div_class='page-content-type'):
     }
 
 
+# Renders a CoreBlock/SplashBlock child like include_block, but from the block fragment cache if enabled
+@register.simple_tag(takes_context=True)
+def include_cached_block(context, block, **kwargs):
+    return render_cached_block(block, context, kwargs)
+
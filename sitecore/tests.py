@@ -1,3 +1,416 @@
-from django.test import TestCase
+import datetime
+import os
+import shutil
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from wagtail.images.tests.utils import get_test_image_file
+from wagtail.images.utils import generate_signature
+from wagtail.models import Page, Site
+
+from taggit.models import Tag
+from wagtailmenus.models import MainMenu
+
+from article.models import ArticleIndexPage, ArticlePage
+from home.models import HomePage
+from sitecore.blocks.embedded import GalleryBlock
+from sitecore.blocks.text import TextSnippet
+from sitecore.cache import PAGE_CACHE_GENERATION, STATIC_EXPORT_ENVIRON_KEY
+from sitecore.models import CacheGeneration, SiteImage, SiteSettings, SiteTagSummary
+from sitecore.pagination import IndexPaginator
+from sitecore.renditions import get_rendition_filter_specs, get_responsive_filter_specs
+
+
+# pages are rendered without running collectstatic first
+RENDER_SETTINGS = {'STATICFILES_STORAGE': 'django.contrib.staticfiles.storage.StaticFilesStorage'}
+
+
+class TemporaryMediaMixin:
+    """
+    Write uploaded images, renditions and the image serve cache to a temporary MEDIA_ROOT, removed once the
+    test case has run.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.media_root, ignore_errors=True)
+
+        media_settings = override_settings(MEDIA_ROOT=cls.media_root)
+        media_settings.enable()
+        cls.addClassCleanup(media_settings.disable)
+
+        # the image serve cache root is read from the settings on import
+        cache_root = os.path.join(cls.media_root, 'image-cache')
+        for target in ('sitecore.image_serve.IMAGE_SERVE_CACHE_ROOT', 'sitecore.views.IMAGE_SERVE_CACHE_ROOT'):
+            patcher = mock.patch(target, cache_root)
+            patcher.start()
+            cls.addClassCleanup(patcher.stop)
+        super().setUpClass()
+
+
+@override_settings(**RENDER_SETTINGS)
+class SiteTestCase(TemporaryMediaMixin, TestCase):
+    """
+    Home page (as the default site root) with an ArticleIndexPage at /news/.
+    """
+
+    def setUp(self):
+        cache.clear()
+        home = Page.get_first_root_node().add_child(instance=HomePage(title='Home', slug='test-home'))
+        Site.objects.all().delete()
+        self.site = Site.objects.create(hostname='localhost', root_page=home, is_default_site=True)
+        self.index_page = home.add_child(instance=ArticleIndexPage(title='News', slug='news', per_page=5))
+        self.index_page.save_revision().publish()
+        self.published_at = timezone.now() - datetime.timedelta(days=30)
+
+    def add_article(self, parent=None, title='Article', tags=(), published_at=None, publish=True):
+        article = (parent or self.index_page).add_child(instance=ArticlePage(
+            title=title,
+            slug=title.lower().replace(' ', '-'),
+            first_published_at=published_at or self.published_at,
+        ))
+        article.tags.add(*tags)
+        if publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                article.save_revision().publish()
+        return ArticlePage.objects.get(pk=article.pk)
+
+
+class IndexPaginatorTest(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # pairs of articles share a publish time, so the pages rely on the pk tie-breaker
+        for number in range(13):
+            self.add_article(
+                title=f'Article {number}',
+                published_at=self.published_at + datetime.timedelta(days=number // 2),
+            )
+
+    def assertPagesMatchOffset(self, ordering, per_page, orphans=0):
+        articles = ArticlePage.objects.live().child_of(self.index_page)
+        paginator = IndexPaginator(articles, per_page, ordering=ordering, orphans=orphans)
+        tie_breaker = '-pk' if ordering.startswith('-') else 'pk'
+        expected = Paginator(articles.order_by(ordering, tie_breaker), per_page, orphans=orphans)
+
+        self.assertTrue(paginator.is_keyset)
+        self.assertEqual(paginator.count, expected.count)
+        self.assertEqual(paginator.num_pages, expected.num_pages)
+        for number in expected.page_range:
+            self.assertEqual(
+                [page.pk for page in paginator.page(number)],
+                [page.pk for page in expected.page(number)],
+                f'page {number} ordered by {ordering}',
+            )
+
+    def test_keyset_pages_match_offset_pages(self):
+        for ordering in ('first_published_at', '-first_published_at', 'title', '-title'):
+            self.assertPagesMatchOffset(ordering, 4)
+
+    def test_keyset_pages_match_offset_pages_with_orphans(self):
+        self.assertPagesMatchOffset('-first_published_at', 4, orphans=2)
+
+    def test_keyset_pages_follow_publish_and_unpublish(self):
+        self.assertPagesMatchOffset('-first_published_at', 4)
+        self.add_article(title='Newest', published_at=timezone.now())
+        self.assertPagesMatchOffset('-first_published_at', 4)
+        ArticlePage.objects.get(slug='article-5').unpublish()
+        self.assertPagesMatchOffset('-first_published_at', 4)
+
+
+@mock.patch('sitecore.wagtail_hooks.CONDITIONAL_GET_ENABLED', True)
+@mock.patch('sitecore.wagtail_hooks.PAGE_CACHE_ENABLED', True)
+class PageCacheTest(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.article = self.add_article(title='First title')
+
+    def get_etag(self, path):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ETag', response)
+        return response['ETag']
+
+    def assertNotModified(self, path, etag):
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def assertModified(self, path, etag):
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_conditional_get(self):
+        etag = self.get_etag('/news/')
+        self.assertNotModified('/news/', etag)
+        self.assertEqual(self.client.get('/news/', HTTP_IF_NONE_MATCH='W/"other"').status_code, 200)
+
+    def test_publish_invalidates_cache_and_validators(self):
+        etag = self.get_etag('/news/')
+        self.assertContains(self.client.get('/news/'), 'First title')
+
+        self.article.title = 'Second title'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.article.save_revision().publish()
+
+        self.assertModified('/news/', etag)
+        response = self.client.get('/news/')
+        self.assertContains(response, 'Second title')
+        self.assertNotContains(response, 'First title')
+
+    def test_draft_does_not_invalidate_validators(self):
+        etag = self.get_etag('/news/')
+        self.article.title = 'Draft title'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.article.save_revision()
+        self.assertNotModified('/news/', etag)
+
+    def test_unpublish_invalidates_validators(self):
+        etag = self.get_etag('/news/')
+        self.assertContains(self.client.get('/news/'), 'href="/news/first-title/"')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.article.unpublish()
+        self.assertModified('/news/', etag)
+        self.assertNotContains(self.client.get('/news/'), 'href="/news/first-title/"')
+
+    def test_settings_edit_invalidates_validators(self):
+        etag = self.get_etag('/news/')
+        settings = SiteSettings.for_site(self.site)
+        with self.captureOnCommitCallbacks(execute=True):
+            settings.save()
+        self.assertModified('/news/', etag)
+
+    def test_menu_edit_invalidates_validators(self):
+        etag = self.get_etag('/news/')
+        with self.captureOnCommitCallbacks(execute=True):
+            MainMenu.objects.create(site=self.site)
+        self.assertModified('/news/', etag)
+
+    def test_snippet_edit_and_delete_invalidate_validators(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            snippet = TextSnippet.objects.create(title='Snippet', text='<p>Text</p>')
+        etag = self.get_etag('/news/')
+        with self.captureOnCommitCallbacks(execute=True):
+            snippet.delete()
+        self.assertModified('/news/', etag)
+
+    def test_image_changes_invalidate_validators(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = SiteImage.objects.create(title='Image', file=get_test_image_file())
+        etag = self.get_etag('/news/')
+
+        image.title = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            image.save(update_fields=['title'])
+        self.assertNotModified('/news/', etag)
+
+        image.focal_point_x = 10
+        with self.captureOnCommitCallbacks(execute=True):
+            image.save(update_fields=['focal_point_x', 'focal_point_y', 'focal_point_width', 'focal_point_height'])
+        self.assertModified('/news/', etag)
+
+        etag = self.get_etag('/news/')
+        with self.captureOnCommitCallbacks(execute=True):
+            image.delete()
+        self.assertModified('/news/', etag)
+
+    def test_generation_is_shared_between_processes(self):
+        etag = self.get_etag('/news/')
+        self.assertContains(self.client.get('/news/'), 'First title')
+
+        # clearing this process's cache keeps the validators, while a publish handled by another process
+        # (which only updates the generation row) invalidates the cached body and validators
+        cache.clear()
+        self.assertNotModified('/news/', etag)
+        ArticlePage.objects.filter(pk=self.article.pk).update(title='Second title')
+        CacheGeneration.objects.filter(name=PAGE_CACHE_GENERATION).update(generation=F('generation') + 1)
+        self.assertModified('/news/', etag)
+        self.assertContains(self.client.get('/news/'), 'Second title')
+
+    def test_static_export_bypasses_the_cache(self):
+        self.assertContains(self.client.get('/news/'), 'First title')
+        # changed without a bump, so only a render that skips the cache sees it
+        ArticlePage.objects.filter(pk=self.article.pk).update(title='Second title')
+        self.assertContains(self.client.get('/news/'), 'First title')
+        self.assertContains(self.client.get('/news/', **{STATIC_EXPORT_ENVIRON_KEY: True}), 'Second title')
+        self.assertContains(self.client.get('/news/'), 'First title')
+
+    def test_authenticated_requests_are_not_cached(self):
+        self.client.force_login(get_user_model().objects.create_user('editor', password='password'))
+        self.assertNotIn('ETag', self.client.get('/news/'))
+
+
+class SiteTagSummaryTest(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.other_index_page = self.index_page.get_parent().add_child(
+            instance=ArticleIndexPage(title='Blog', slug='blog', per_page=5)
+        )
+
+    def get_tag_cloud(self):
+        return dict(SiteTagSummary.get_tag_cloud().values_list('slug', 'num_tags'))
+
+    def assertCountsMatchRebuild(self, expected):
+        self.assertEqual(self.get_tag_cloud(), expected)
+        SiteTagSummary.rebuild()
+        self.assertEqual(self.get_tag_cloud(), expected)
+
+    def test_publish_counts_tags(self):
+        self.add_article(title='Article 1', tags=['alpha', 'beta'])
+        self.add_article(title='Article 2', tags=['alpha'])
+        self.assertCountsMatchRebuild({'alpha': 2, 'beta': 1})
+
+    def test_draft_is_not_counted(self):
+        self.add_article(title='Article 1', tags=['alpha'])
+        self.add_article(title='Article 2', tags=['alpha'], publish=False)
+        self.assertCountsMatchRebuild({'alpha': 1})
+
+    def test_unpublish_removes_count(self):
+        article = self.add_article(title='Article 1', tags=['alpha', 'beta'])
+        self.add_article(title='Article 2', tags=['alpha'])
+        with self.captureOnCommitCallbacks(execute=True):
+            article.unpublish()
+        self.assertCountsMatchRebuild({'alpha': 1})
+
+    def test_move_keeps_counts(self):
+        article = self.add_article(title='Article 1', tags=['alpha'])
+        with self.captureOnCommitCallbacks(execute=True):
+            article.move(self.other_index_page, pos='last-child')
+        self.assertCountsMatchRebuild({'alpha': 1})
+
+    def test_tag_removal_and_rename(self):
+        article = self.add_article(title='Article 1', tags=['alpha', 'beta'])
+        with self.captureOnCommitCallbacks(execute=True):
+            article.tags.remove('beta')
+            article.save_revision().publish()
+        self.assertCountsMatchRebuild({'alpha': 1})
+
+        tag = Tag.objects.get(slug='alpha')
+        tag.name = 'Alpha!'
+        tag.save()
+        self.assertEqual(SiteTagSummary.objects.get(tag=tag).name, 'Alpha!')
+
+
+@override_settings(**RENDER_SETTINGS)
+class ImageServeViewTest(TemporaryMediaMixin, TestCase):
+
+    # no image (or image serve cache) with this id exists
+    image_id = 987654321
+
+    def get_url(self, signature, image_id, filter_spec):
+        return reverse('sitecore_image_serve', args=(signature, image_id, filter_spec)) + 'image.jpg'
+
+    def test_images_page_subpaths_are_not_shadowed(self):
+        self.assertEqual(resolve('/images/archive/2024/spring/').url_name, 'wagtail_serve')
+        self.assertTrue(self.get_url('abc', 1, 'fill-100x100').startswith('/_images/'))
+
+    def test_tampered_signatures_are_rejected(self):
+        signature = generate_signature(self.image_id, 'fill-100x100')
+        for image_id, filter_spec in ((self.image_id, 'fill-900x900'), (self.image_id + 1, 'fill-100x100')):
+            response = self.client.get(self.get_url(signature, image_id, filter_spec))
+            self.assertEqual(response.status_code, 403)
+            self.assertFalse(response.has_header('Cache-Control'))
+        response = self.client.get(self.get_url('not-a-signature', self.image_id, 'fill-100x100'))
+        self.assertEqual(response.status_code, 403)
+
+    def test_signed_url_for_missing_image(self):
+        # the signature is accepted, so the image is looked up
+        response = self.client.get(self.get_url(generate_signature(self.image_id, 'fill-100x100'), self.image_id, 'fill-100x100'))
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('Cache-Control'))
+
+    def test_signed_url_is_served_from_the_cache(self):
+        image = SiteImage.objects.create(title='Image', file=get_test_image_file())
+        url = self.get_url(generate_signature(image.pk, 'fill-100x100'), image.pk, 'fill-100x100')
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertTrue(os.listdir(os.path.join(self.media_root, 'image-cache', str(image.pk))))
+
+        # served from the cache without reading the image
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+
+@override_settings(**RENDER_SETTINGS)
+class GalleryImagesViewTest(TemporaryMediaMixin, TestCase):
+
+    def get_token(self, images=(SimpleNamespace(pk=1), SimpleNamespace(pk=2))):
+        return GalleryBlock.get_token(images, {
+            'gallery_type': 'fill-300x300',
+            'gallery_image_title': True,
+            'gallery_image_caption': False,
+        })
+
+    def test_signed_token(self):
+        response = self.client.get(GalleryBlock.get_page_url(self.get_token(), 1))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('public', response['Cache-Control'])
+
+    def test_signed_token_renders_its_images(self):
+        images = [SiteImage.objects.create(title=f'Image {number}', file=get_test_image_file()) for number in range(2)]
+        response = self.client.get(GalleryBlock.get_page_url(self.get_token(images), 1))
+        self.assertContains(response, '<figure', count=2)
+
+    def test_tampered_tokens_are_rejected(self):
+        token = self.get_token()
+        value, timestamp, signature = token.split(':')
+        # swap a payload character for one it is not, so the value always changes
+        tampered_value = value[:-1] + ('B' if value.endswith('A') else 'A')
+        tampered = [
+            '',
+            'not-a-token',
+            f'{value}:{timestamp}:{signature[::-1]}',
+            f'{tampered_value}:{timestamp}:{signature}',
+        ]
+        for token in tampered:
+            response = self.client.get(reverse('sitecore_gallery_images'), {'gallery': token, 'page': 1})
+            self.assertEqual(response.status_code, 403, token)
+
+    def test_token_signed_for_another_use_is_rejected(self):
+        # signed with the default salt rather than the gallery salt
+        token = signing.dumps({'images': [1], 'filter_spec': 'original', 'title': True, 'caption': True}, compress=True)
+        response = self.client.get(GalleryBlock.get_page_url(token, 1))
+        self.assertEqual(response.status_code, 403)
+
+
+class RenditionFilterSpecsTest(TestCase):
+
+    def test_responsive_renditions_are_registered(self):
+        filter_specs = set(get_rendition_filter_specs())
+        base_specs = [spec for spec, label in GalleryBlock.GALLERY_FILTERSPEC_CHOICES]
+        base_specs += [spec for spec, label in ArticlePage.ARTICLE_IMAGE_FILTERSPEC_CHOICES]
+        for base_spec in base_specs:
+            for format, specs in get_responsive_filter_specs(base_spec):
+                self.assertTrue(set(specs) <= filter_specs, base_spec)
+
+    def test_template_renditions_are_registered(self):
+        filter_specs = set(get_rendition_filter_specs())
+        for filter_spec in ('fill-300x300', 'fill-600x150', 'fill-600x300', 'fill-1200x300', 'fill-1200x400', 'max-169x72'):
+            self.assertIn(filter_spec, filter_specs)
+
+
+class RenditionQueueTest(TemporaryMediaMixin, TestCase):
+
+    def test_uploads_leave_renditions_to_the_command_without_workers(self):
+        with mock.patch('sitecore.renditions.RENDITION_WORKERS', 0), mock.patch('sitecore.renditions.get_executor') as get_executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                image = SiteImage.objects.create(title='Image', file=get_test_image_file())
+        get_executor.assert_not_called()
+        image.refresh_from_db()
+        # left for 'generate_renditions --missing'
+        self.assertEqual(image.placeholder, '')
+        self.assertFalse(image.renditions.exists())
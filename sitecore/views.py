@@ -1,3 +1,86 @@
-from django.shortcuts import render
+import mimetypes
+import os
 
-# Create your views here.
+from django.core import signing
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
+from django.http import FileResponse, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.template.loader import render_to_string
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control
+from django.views.generic import View
+
+from wagtail.images import get_image_model
+from wagtail.images.exceptions import InvalidFilterSpecError
+from wagtail.images.models import SourceImageIOError
+from wagtail.images.utils import verify_signature
+
+from sitecore.blocks.embedded import GALLERY_PAGE_SIZE, GalleryBlock
+from sitecore.image_serve import (
+    IMAGE_SERVE_ACCEL_PREFIX, IMAGE_SERVE_CACHE_ROOT, IMAGE_SERVE_MAX_AGE, cache_image, find_cached_image,
+)
+
+
+class ImageServeView(View):
+    """
+    Serve the image for a signed (image, filter spec) URL from the disk cache (see sitecore.image_serve),
+    making it on the first request. The signature is checked before anything else, and cache hits read
+    neither the database nor the source image.
+    """
+
+    def get(self, request, signature, image_id, filter_spec, filename=None):
+        if not verify_signature(signature.encode(), image_id, filter_spec):
+            raise PermissionDenied
+
+        path = find_cached_image(image_id, filter_spec)
+        if path is None:
+            image = get_object_or_404(get_image_model(), id=image_id)
+            try:
+                path = cache_image(image, filter_spec)
+            except SourceImageIOError:
+                return HttpResponse('Source image file not found', content_type='text/plain', status=410)
+            except InvalidFilterSpecError:
+                return HttpResponse('Invalid filter spec: ' + filter_spec, content_type='text/plain', status=400)
+
+        # only the image may be cached (e.g., by proxies); errors such as a missing source file can be transient
+        response = self.serve(path)
+        patch_cache_control(response, max_age=IMAGE_SERVE_MAX_AGE, public=True)
+        return response
+
+    def serve(self, path):
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if IMAGE_SERVE_ACCEL_PREFIX:
+            response = HttpResponse(content_type=content_type)
+            response['X-Accel-Redirect'] = IMAGE_SERVE_ACCEL_PREFIX + path
+            return response
+        return FileResponse(open(os.path.join(IMAGE_SERVE_CACHE_ROOT, path), 'rb'), content_type=content_type)
+
+
+class GalleryImagesView(View):
+    """
+    Render a page of the images a GalleryBlock leaves out of the page render (see GalleryBlock.get_context)
+    as an HTML fragment, ending with the link to the next page. The images are given by the signed token
+    in the link, so the view needs no page or stream lookups and renders no more than the gallery shows.
+    """
+
+    @method_decorator(cache_control(max_age=IMAGE_SERVE_MAX_AGE, public=True))
+    def get(self, request):
+        token = request.GET.get('gallery', '')
+        try:
+            gallery = GalleryBlock.load_token(token)
+        except signing.BadSignature:
+            raise PermissionDenied
+
+        page = Paginator(gallery['images'], GALLERY_PAGE_SIZE).get_page(request.GET.get('page'))
+        images_by_id = get_image_model().objects.in_bulk(page.object_list)
+        images = [images_by_id[image_id] for image_id in page.object_list if image_id in images_by_id]
+
+        return HttpResponse(render_to_string('sitecore/blocks/gallery_images.html', {
+            'images': GalleryBlock.prefetch_renditions(images, gallery['filter_spec']),
+            'filter_spec': gallery['filter_spec'],
+            'show_title': gallery['title'],
+            'show_caption': gallery['caption'],
+            'next_url': GalleryBlock.get_page_url(token, page.next_page_number()) if page.has_next() else None,
+        }))
@@ -6,12 +6,22 @@ Sitecore Wagtail hooks to append/modify default behaviour of the Wagtail system.
 
 from django.conf import settings
 from django.templatetags.static import static
+from django.utils.cache import get_conditional_response
 from django.utils.html import format_html, format_html_join
 
 import wagtail.admin.rich_text.editors.draftail.features as draftail_features
 
 from wagtail.admin.rich_text.converters.html_to_contentstate import BlockElementHandler, InlineStyleElementHandler
 from wagtail import hooks
+from wagtail.models import Site
+
+from sitecore.blocks.embedded import GalleryBlock
+from sitecore.cache import (
+    CONDITIONAL_GET_ENABLED, PAGE_CACHE_ENABLED, get_cached_response, get_page_cache_key, get_page_validators,
+    is_anonymous_page_request, is_cacheable_response, is_static_export_request, set_cached_response,
+    set_page_validators,
+)
+from sitecore.renditions import get_responsive_rendition_filter_specs
 
 
 @hooks.register('insert_global_admin_css')
@@ -146,3 +156,58 @@ def register_display_4_feature(features):
     })
     
     # features.default_features.append('display-4')
+
+
+@hooks.register('before_serve_page', order=100)
+def serve_anonymous_page(page, request, serve_args, serve_kwargs):
+    """
+    This hook serves anonymous GET requests for SitePage derived pages (see SitePage.cache_page_response):
+    1) conditional GETs are answered with a 304 (before anything is rendered) when the ETag/Last-Modified
+       validators still match, and 200 responses carry the validators. Routes whose arguments the view
+       would reject (see SitePage.is_valid_route) have no validators, so are never answered with a 304
+    2) responses come from the page response cache (see sitecore/cache.py). On a miss, the page is served
+       here - via SitePage.serve or the matched RoutablePageMixin route, as serve_args holds the route
+       view - and the rendered response is cached. Static export renders (see sitecore/static_export.py)
+       neither read nor write the cache, so the export always writes the current content.
+    Ordered after the Wagtail view restriction check, and restricted pages are never cached.
+    """
+    if not (CONDITIONAL_GET_ENABLED or PAGE_CACHE_ENABLED) or not is_anonymous_page_request(page, request):
+        return None
+
+    validators = get_page_validators(page, request, serve_args, serve_kwargs) if CONDITIONAL_GET_ENABLED else None
+    if validators:
+        etag, last_modified = validators
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            return response
+
+    response = None
+    use_cache = PAGE_CACHE_ENABLED and not is_static_export_request(request)
+    if use_cache:
+        cache_key = get_page_cache_key(Site.find_for_request(request), request)
+        response = get_cached_response(cache_key, request)
+    if response is None:
+        response = page.serve(request, *serve_args, **serve_kwargs)
+        if hasattr(response, 'render') and not response.is_rendered:
+            response.render()
+        if use_cache and is_cacheable_response(response):
+            set_cached_response(cache_key, response)
+
+    if validators:
+        set_page_validators(response, *validators)
+    return response
+
+
+
+@hooks.register('register_rendition_filter_specs')
+def sitecore_rendition_filter_specs():
+    """
+    This hook adds the renditions generated on image upload (see sitecore/renditions.py) for the gallery
+    styles (rendered responsively), the article/event listing summaries and cards, the carousel slides, the
+    password page image and the navbar brand logo.
+    """
+    return get_responsive_rendition_filter_specs(
+        [spec for spec, label in GalleryBlock.GALLERY_FILTERSPEC_CHOICES]
+    ) + [
+        'fill-300x300', 'fill-600x150', 'fill-600x300', 'fill-1200x400', 'max-169x72',
+    ]